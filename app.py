@@ -1,14 +1,33 @@
 # main.py
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
+import threading
+from config import LAZY_STARTUP
 from routes.api_routes import api_router
-from src.model_loader import ModelLoader
+from routes.admin_routes import admin_router
+from routes.advisory_routes import advisory_router
+from src.advisories import get_advisory_scheduler
+from src.region_models import region_model_cache
+from src.utils import LazyImport
 import uvicorn
 
+ModelLoader = LazyImport("src.model_loader", "ModelLoader")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Load models during startup
-    ModelLoader.load_models()
+    # Load models during startup (applies the tuned thread profile first);
+    # in lazy mode serve right away and let the first prediction wait
+    if LAZY_STARTUP:
+        # The thread resolves ModelLoader, so torch is imported off the event loop too
+        threading.Thread(target=lambda: ModelLoader.load_models(), name="model-warmup", daemon=True).start()
+    else:
+        ModelLoader.load_models()
+    # Warm region model sets predicted to be hot by time of day
+    region_model_cache.start_prefetcher()
+    # Daily / forecast-triggered advisory precompute for registered fields
+    advisory_scheduler = get_advisory_scheduler()
+    if advisory_scheduler is not None:
+        advisory_scheduler.start()
     yield
     # Cleanup on shutdown (if needed)
 
@@ -21,6 +40,13 @@ app = FastAPI(
 
 # Include router
 app.include_router(api_router, prefix="/api")
+app.include_router(admin_router, prefix="/api")
+app.include_router(advisory_router, prefix="/api")
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=5000)
\ No newline at end of file
+    # Worker count comes from the autotune profile (python -m src.autotune)
+    workers = ModelLoader.apply_tuned_profile().get("workers", 1)
+    if workers > 1:
+        uvicorn.run("app:app", host="0.0.0.0", port=5000, workers=workers)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=5000)
\ No newline at end of file
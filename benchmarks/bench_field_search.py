@@ -0,0 +1,72 @@
+"""
+benchmarks/bench_field_search.py
+--------------------------------
+Similar-field search latency over a FieldEmbeddingStore with millions of rows,
+int8 vs float32 storage, plus recall of the int8 top-k against an exact
+float32 search.
+
+    python -m benchmarks.bench_field_search [--fields 1000000] [--queries 50] [--k 10]
+
+Embeddings are synthetic: clustered 64-d vectors, roughly the shape of the
+crop model's triplet-trained space.
+"""
+import argparse
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from src.field_embeddings import FieldEmbeddingStore
+
+DIM = 64
+APPEND_BATCH = 100_000
+
+
+def _embeddings(n, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(scale=2.0, size=(32, DIM)).astype(np.float32)
+    return centres[rng.integers(0, len(centres), size=n)] + rng.normal(size=(n, DIM)).astype(np.float32)
+
+
+def _build(directory, vectors, quantize):
+    store = FieldEmbeddingStore(directory, dim=DIM, quantize=quantize)
+    start = time.perf_counter()
+    for offset in range(0, len(vectors), APPEND_BATCH):
+        chunk = vectors[offset:offset + APPEND_BATCH]
+        store.put_many([f"field-{offset + i}" for i in range(len(chunk))], chunk)
+    return store, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--fields", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    vectors = _embeddings(args.fields)
+    query_ids = np.random.default_rng(1).integers(0, args.fields, size=args.queries)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, quantize in (("float32", False), ("int8", True)):
+            store, build_s = _build(f"{tmp}/{name}", vectors, quantize)
+            latencies, neighbours = [], []
+            for q in query_ids:
+                field_id = f"field-{q}"
+                start = time.perf_counter()
+                result = store.most_similar(store.get(field_id), args.k, exclude=field_id)
+                latencies.append((time.perf_counter() - start) * 1e3)
+                neighbours.append({n["field_id"] for n in result["neighbours"]})
+            results[name] = neighbours
+            latencies.sort()
+            print(f"{name:8s} build {build_s:6.2f} s  {store.stats()['bytes'] / 1e6:7.1f} MB  "
+                  f"query p50 {statistics.median(latencies):6.1f} ms  "
+                  f"p95 {latencies[int(0.95 * (len(latencies) - 1))]:6.1f} ms")
+
+    recall = np.mean([len(a & b) / args.k for a, b in zip(results["int8"], results["float32"])])
+    print(f"int8 recall@{args.k} vs float32: {recall:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+benchmarks/bench_fused.py
+-------------------------
+Compare separate SustainabilityPredictor + YieldPredictor execution against
+the horizontally fused FusedPredictor on the same batches.
+
+    python -m benchmarks.bench_fused [--repeats 500]
+
+Uses the checkpoints in MODEL_PATHS when present, otherwise random weights of
+the same shapes. Both paths start from request dicts, so the separate path
+pays for DataPreprocessor per model and the fused path for raw_batch only.
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+import torch
+
+from src.data_preprocessing import DataPreprocessor
+from src.fused_models import FusedPredictor
+from src.model_definitions import SustainabilityPredictor, YieldPredictor
+from src.model_loader import ModelLoader
+
+BATCH_SIZES = [1, 2, 4, 8, 16, 32]
+
+
+def _models():
+    models = ModelLoader.load_models()
+    if models.get("sustainability") is None or models.get("yield") is None:
+        print("Checkpoints not found, using random weights")
+        torch.manual_seed(0)
+        models = {
+            "sustainability": SustainabilityPredictor(input_size=10).eval(),
+            "yield": YieldPredictor(input_size=10).eval(),
+        }
+    return {key: models[key].cpu() for key in ("sustainability", "yield")}
+
+
+def _records(n, rng):
+    crop_types = DataPreprocessor.CROP_TYPES
+    return [
+        {
+            "temperature_c": rng.uniform(10, 40),
+            "humidity_pct": rng.uniform(20, 100),
+            "soil_ph": rng.uniform(4.5, 8.5),
+            "rainfall_mm": rng.uniform(0, 300),
+            "soil_moisture_pct": rng.uniform(20, 90),
+            "fertilizer_usage_kg": rng.uniform(0, 50),
+            "pesticide_usage_kg": rng.uniform(0, 20),
+            "crop_type": crop_types[rng.integers(len(crop_types))],
+        }
+        for _ in range(n)
+    ]
+
+
+def _separate(models, records):
+    with torch.no_grad():
+        out = {}
+        for key, model in models.items():
+            x = np.stack([DataPreprocessor.normalize_for(key, r) for r in records])
+            out[key] = model(torch.from_numpy(x).float()).numpy()[:, 0]
+    return out
+
+
+def _time(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeats", type=int, default=500)
+    args = parser.parse_args()
+
+    torch.set_grad_enabled(False)
+    models = _models()
+    fused = FusedPredictor(models)
+    rng = np.random.default_rng(0)
+
+    print(f"{'batch':>5} {'separate_us':>12} {'fused_us':>10} {'speedup':>8} {'max_abs_diff':>13}")
+    for batch in BATCH_SIZES:
+        records = _records(batch, rng)
+        reference = _separate(models, records)
+        fused_out = fused.predict(records)
+        diff = max(float(np.max(np.abs(reference[k] - fused_out[k]))) for k in models)
+
+        separate_us = _time(lambda: _separate(models, records), args.repeats)
+        fused_us = _time(lambda: fused.predict(records), args.repeats)
+        print(f"{batch:>5} {separate_us:>12.1f} {fused_us:>10.1f} "
+              f"{separate_us / fused_us:>7.2f}x {diff:>13.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+benchmarks/bench_shared_cache.py
+--------------------------------
+Compare the shared-memory SharedPredictionCache against an out-of-process
+key/value server (a multiprocessing.Manager dict, standing in for Redis: one
+IPC round-trip per operation) under concurrent workers.
+
+    python -m benchmarks.bench_shared_cache [--workers 4] [--ops 20000]
+
+Every worker runs the same 90% get / 10% put mix over Zipf-distributed feature
+vectors, as API workers would over a host's hot fields.
+"""
+import argparse
+import multiprocessing as mp
+import statistics
+import time
+
+import numpy as np
+
+from src.shared_cache import SharedPredictionCache
+
+CACHE_NAME = "agri_bench_cache"
+N_SLOTS = 1 << 16
+N_DISTINCT = 20_000
+READ_RATIO = 0.9
+
+
+def _workload(seed, n_ops):
+    rng = np.random.default_rng(seed)
+    features = np.random.default_rng(0).normal(size=(N_DISTINCT, 10))
+    ids = np.minimum(rng.zipf(1.2, size=n_ops), N_DISTINCT) - 1
+    reads = rng.random(n_ops) < READ_RATIO
+    return features, ids, reads
+
+
+def _shared_worker(seed, n_ops, queue):
+    cache = SharedPredictionCache.attach(CACHE_NAME, n_slots=N_SLOTS, ways=8, lock_stripes=64, quantum=1e-3)
+    features, ids, reads = _workload(seed, n_ops)
+    latencies, hits = [], 0
+    for i, read in zip(ids, reads):
+        start = time.perf_counter()
+        if read:
+            hits += cache.get("yield", features[i]) is not None
+        else:
+            cache.put("yield", features[i], float(i))
+        latencies.append(time.perf_counter() - start)
+    cache.close()
+    queue.put((latencies, hits))
+
+
+def _kv_worker(seed, n_ops, store, queue):
+    features, ids, reads = _workload(seed, n_ops)
+    latencies, hits = [], 0
+    for i, read in zip(ids, reads):
+        # Same quantized key the shared cache would hash
+        key = np.round(features[i] / 1e-3).astype(np.int64).tobytes()
+        start = time.perf_counter()
+        if read:
+            hits += store.get(key) is not None
+        else:
+            store[key] = float(i)
+        latencies.append(time.perf_counter() - start)
+    queue.put((latencies, hits))
+
+
+def _run(target, extra_args, workers, n_ops):
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    procs = [ctx.Process(target=target, args=(seed, n_ops, *extra_args, queue)) for seed in range(workers)]
+    start = time.perf_counter()
+    for proc in procs:
+        proc.start()
+    results = [queue.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+    wall = time.perf_counter() - start
+    latencies = [lat for lats, _ in results for lat in lats]
+    hits = sum(h for _, h in results)
+    reads = int(len(latencies) * READ_RATIO)
+    return {
+        "ops_per_s": len(latencies) / sum(latencies) * workers,
+        "p50_us": statistics.median(latencies) * 1e6,
+        "p99_us": float(np.percentile(latencies, 99)) * 1e6,
+        "hit_rate": hits / max(reads, 1),
+        "wall_s": wall,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--ops", type=int, default=20_000)
+    args = parser.parse_args()
+
+    creator = SharedPredictionCache.attach(CACHE_NAME, n_slots=N_SLOTS, ways=8, lock_stripes=64, quantum=1e-3)
+    try:
+        shared = _run(_shared_worker, (), args.workers, args.ops)
+    finally:
+        creator.close()
+        SharedPredictionCache.unlink(CACHE_NAME)
+
+    with mp.get_context("spawn").Manager() as manager:
+        kv = _run(_kv_worker, (manager.dict(),), args.workers, args.ops)
+
+    print(f"{'backend':>14} {'ops/s':>12} {'p50_us':>8} {'p99_us':>8} {'hit_rate':>8}")
+    for name, r in (("shared_memory", shared), ("kv_server", kv)):
+        print(f"{name:>14} {r['ops_per_s']:>12,.0f} {r['p50_us']:>8.1f} {r['p99_us']:>8.1f} {r['hit_rate']:>8.2%}")
+
+
+if __name__ == "__main__":
+    main()
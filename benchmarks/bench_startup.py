@@ -0,0 +1,130 @@
+"""
+benchmarks/bench_startup.py
+---------------------------
+Cold-start budget check: the per-module import-time breakdown of `import app`
+(python -X importtime) and the time from process start to the first
+successful prediction from a freshly spawned uvicorn server.
+
+    python -m benchmarks.bench_startup [--runs 3] [--lazy] [--top 15]
+
+Exits with status 1 when the median import time or time to first prediction
+is over STARTUP_IMPORT_BUDGET_MS / STARTUP_FIRST_PREDICTION_BUDGET_MS (or
+the --*-budget-ms overrides), so it can gate CI and deploy pipelines.
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from config import STARTUP_IMPORT_BUDGET_MS, STARTUP_FIRST_PREDICTION_BUDGET_MS
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+_IMPORTTIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+YIELD_REQUEST = {
+    "soil_ph": 6.5, "soil_moisture_pct": 60.0, "temperature_c": 25.0, "rainfall_mm": 100.0,
+    "fertilizer_usage_kg": 15.0, "pesticide_usage_kg": 8.0, "crop_type": "rice",
+}
+
+
+def import_breakdown(env):
+    """(total ms, [(self ms, cumulative ms, depth, module)]) for `import app`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=REPO_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            rows.append((int(self_us) / 1e3, int(cumulative_us) / 1e3, len(indent) // 2, module))
+    total = next(cumulative for _, cumulative, _, module in rows if module == "app")
+    return total, rows
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def first_prediction(env, timeout_s=120.0):
+    """Seconds from spawning the server to its first /health and /predict/yield 200s."""
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}/api"
+    body = json.dumps(YIELD_REQUEST).encode()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    healthy = None
+    try:
+        while time.perf_counter() - start < timeout_s:
+            if server.poll() is not None:
+                raise RuntimeError(f"server exited with status {server.returncode}")
+            try:
+                if healthy is None:
+                    urllib.request.urlopen(f"{base}/predict/health", timeout=5).read()
+                    healthy = time.perf_counter() - start
+                request = urllib.request.Request(
+                    f"{base}/predict/yield", data=body, headers={"Content-Type": "application/json"}
+                )
+                urllib.request.urlopen(request, timeout=timeout_s).read()
+                return healthy, time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.01)
+        raise TimeoutError(f"no successful prediction within {timeout_s} s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--lazy", action="store_true", help="set AGRI_LAZY_STARTUP=1 for the server")
+    parser.add_argument("--top", type=int, default=15, help="modules listed in the breakdown")
+    parser.add_argument("--import-budget-ms", type=float, default=STARTUP_IMPORT_BUDGET_MS)
+    parser.add_argument("--prediction-budget-ms", type=float, default=STARTUP_FIRST_PREDICTION_BUDGET_MS)
+    args = parser.parse_args()
+
+    env = dict(os.environ, PYTHONUNBUFFERED="1")
+    if args.lazy:
+        env["AGRI_LAZY_STARTUP"] = "1"
+
+    imports = [import_breakdown(env) for _ in range(args.runs)]
+    import_ms = statistics.median(total for total, _ in imports)
+    _, rows = imports[-1]
+    print(f"import app: median {import_ms:.0f} ms over {args.runs} runs "
+          f"(torch imported: {any(module == 'torch' for *_, module in rows)})")
+    print(f"  {'cumulative ms':>13} {'self ms':>8}  module")
+    for self_ms, cumulative_ms, depth, module in sorted(rows, key=lambda r: -r[1])[:args.top]:
+        print(f"  {cumulative_ms:13.1f} {self_ms:8.1f}  {'  ' * depth}{module}")
+
+    starts = [first_prediction(env) for _ in range(args.runs)]
+    health_ms = statistics.median(h for h, _ in starts) * 1e3
+    prediction_ms = statistics.median(p for _, p in starts) * 1e3
+    mode = "lazy" if args.lazy else "eager"
+    print(f"server ({mode}): first /health {health_ms:.0f} ms, first prediction {prediction_ms:.0f} ms")
+
+    failures = []
+    if import_ms > args.import_budget_ms:
+        failures.append(f"import app {import_ms:.0f} ms > budget {args.import_budget_ms:.0f} ms")
+    if prediction_ms > args.prediction_budget_ms:
+        failures.append(f"first prediction {prediction_ms:.0f} ms > budget {args.prediction_budget_ms:.0f} ms")
+    for failure in failures:
+        print(f"OVER BUDGET: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
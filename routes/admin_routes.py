@@ -0,0 +1,85 @@
+import hmac
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+
+from config import ADMIN_TOKEN, PROFILE_MAX_DURATION_S
+from src.advisories import get_advisory_scheduler
+from src.profiling import ProfileCapture, ProfilerBusy
+from src.region_models import region_model_cache
+
+# --------------------------------------------------------------------------
+# FastAPI router
+# --------------------------------------------------------------------------
+def require_admin(x_admin_token: str | None = Header(default=None)) -> None:
+    # Without a configured token the admin surface does not exist
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid admin token")
+
+
+admin_router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+# --------------------------------------------------------------------------
+# Endpoints
+# --------------------------------------------------------------------------
+@admin_router.post("/profile")
+async def profile_endpoint(
+    mode: Literal["sampling", "torch"] = Query(
+        default="sampling",
+        description="'sampling' for Python stack samples of every thread; 'torch' for a torch.profiler "
+                    "trace of ops on the event loop thread only (the crop/sustainability/yield/combined "
+                    "handlers, not optimize-inputs, region loads or advisory runs)",
+    ),
+    duration_s: float = Query(default=10.0, gt=0, le=PROFILE_MAX_DURATION_S),
+    output_format: Literal["collapsed", "speedscope"] = Query(
+        default="collapsed", alias="format",
+        description="Sampling output; torch captures are always Chrome-trace JSON",
+    ),
+    interval_ms: float = Query(default=5.0, ge=1.0, le=1000.0),
+    hot_path_only: bool = Query(
+        default=True,
+        description="Keep only stacks through _predict, DataPreprocessor, predict_* and InputOptimizer",
+    ),
+):
+    """Capture a profile of the live process for duration_s and return it as a file."""
+    try:
+        content, media_type, filename = await ProfileCapture.capture(
+            mode, duration_s, output_format, interval_ms=interval_ms, hot_path_only=hot_path_only
+        )
+    except ProfilerBusy as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc)) from exc
+
+    return Response(
+        content=content,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@admin_router.get("/regions")
+async def regions_endpoint():
+    """Resident region model sets, hit/miss counts and miss-load latency."""
+    return region_model_cache.stats()
+
+
+@admin_router.get("/advisories")
+async def advisory_runs_endpoint():
+    """Registered field count and the most recent advisory runs."""
+    scheduler = get_advisory_scheduler()
+    if scheduler is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Advisories are disabled")
+    return {"fields": scheduler.store.count_fields(), "runs": scheduler.store.recent_runs()}
+
+
+@admin_router.post("/advisories/run", status_code=status.HTTP_202_ACCEPTED)
+async def advisory_run_endpoint():
+    """Score every registered field now (in the background scheduler thread)."""
+    scheduler = get_advisory_scheduler()
+    if scheduler is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Advisories are disabled")
+    scheduler.start()
+    scheduler.request_run()
+    return {"scheduled": True}
@@ -0,0 +1,95 @@
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, HTTPException, status
+from pydantic import BaseModel, Field
+
+from src.advisories import get_advisory_scheduler
+from src.region_models import RegionModelCache
+
+# --------------------------------------------------------------------------
+# FastAPI router
+# --------------------------------------------------------------------------
+advisory_router = APIRouter(prefix="/advisories", tags=["advisories"])
+
+
+# --------------------------------------------------------------------------
+# Pydantic request/response models
+# --------------------------------------------------------------------------
+class FieldRegistration(BaseModel):
+    field_id: str = Field(..., min_length=1, max_length=128)
+    region: Optional[str] = None
+    n: float
+    p: float
+    k: float
+    soil_ph: float
+    fertilizer_usage_kg: float
+    pesticide_usage_kg: float
+    crop_type: Literal[
+        "rice", "wheat", "corn", "sugarcane", "pulses", "cotton", "other"
+    ] = Field(default="other")
+    # Used when the day's forecast file has no value for the field or its region
+    temperature_c: float
+    humidity_pct: float
+    rainfall_mm: float
+    soil_moisture_pct: float
+
+
+class FieldRegistrationRequest(BaseModel):
+    fields: List[FieldRegistration] = Field(..., min_length=1)
+
+
+class Freshness(BaseModel):
+    computed_at: str
+    age_s: float
+    run_id: int
+    trigger: str  # daily, forecast or manual
+    forecast: Optional[str] = None  # forecast file the run used
+    stale: bool
+
+
+class AdvisoryResponse(BaseModel):
+    field_id: str
+    region: Optional[str] = None
+    status: Literal["ready", "pending"]  # pending: registered, not scored yet
+    recommended_crop: Optional[str] = None
+    sustainability_score: Optional[float] = None
+    predicted_yield_kg_per_hectare: Optional[float] = None
+    freshness: Optional[Freshness] = None
+
+
+def _scheduler():
+    scheduler = get_advisory_scheduler()
+    if scheduler is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Advisories are disabled")
+    return scheduler
+
+
+# --------------------------------------------------------------------------
+# Endpoints
+# --------------------------------------------------------------------------
+@advisory_router.post("/fields", status_code=status.HTTP_200_OK)
+async def register_fields_endpoint(req: FieldRegistrationRequest):
+    """Register (or update) fields for the daily advisory run."""
+    fields = [field.dict() for field in req.fields]
+    for field in fields:
+        if field["region"] is not None:
+            try:
+                RegionModelCache.validate(field["region"])
+            except ValueError as exc:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    registered = _scheduler().store.register_fields(fields)
+    return {"registered": registered}
+
+
+@advisory_router.get(
+    "/{field_id}",
+    response_model=AdvisoryResponse,
+    response_model_exclude_none=True,
+)
+async def advisory_endpoint(field_id: str):
+    """Latest precomputed advisory for a registered field, with freshness metadata."""
+    advisory = _scheduler().store.get_advisory(field_id)
+    if advisory is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail=f"Field {field_id!r} is not registered")
+    return advisory
@@ -1,13 +1,35 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import numpy as np
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
-from typing import Literal, Dict, Callable
-from src.model_loader import ModelLoader  # loads & returns torch models
-from src.predict_torch import (
-    predict_crop,
-    predict_sustainability,
-    predict_yield,
+from typing import Literal, Dict, Callable, Optional, List, Tuple
+from src.data_preprocessing import DataPreprocessor
+from src.field_state import field_state_store
+from src.shared_cache import get_shared_cache
+from src.drift import drift_monitor
+from src.region_models import RegionModelCache, region_model_cache
+from src.field_embeddings import get_field_embedding_store
+from src.advisories import get_advisory_scheduler
+from config import (
+    EXPLAIN_IG_STEPS,
+    EXPLAIN_MAX_IG_STEPS,
+    REGION_HEADER,
+    OPTIMIZER_BOUNDS,
+    FIELD_SEARCH_MAX_K,
 )
-from src.utils import log_prediction
+from src.utils import LazyImport, log_prediction
+
+# Torch-backed modules are imported on first use, not when the app is imported
+ModelLoader = LazyImport("src.model_loader", "ModelLoader")  # loads & returns torch models
+estimate_uncertainty = LazyImport("src.uncertainty", "estimate_uncertainty")
+explain_batch = LazyImport("src.explain", "explain_batch")
+InputOptimizer = LazyImport("src.input_optimizer", "InputOptimizer")
+embed_crop = LazyImport("src.predict_torch", "embed_crop")
+nearest_crop = LazyImport("src.predict_torch", "nearest_crop")
+predict_crop = LazyImport("src.predict_torch", "predict_crop")
+predict_sustainability = LazyImport("src.predict_torch", "predict_sustainability")
+predict_yield = LazyImport("src.predict_torch", "predict_yield")
+predict_combined = LazyImport("src.predict_torch", "predict_combined")
 
 # --------------------------------------------------------------------------
 # FastAPI router
@@ -32,6 +54,15 @@ class CropPredictionRequest(BaseModel):
     crop_type: Literal[
         "rice", "wheat", "corn", "sugarcane", "pulses", "cotton", "other"
     ] = Field(default="other", description="Plain string; one‑hot happens server‑side")
+    field_id: Optional[str] = Field(
+        default=None,
+        description="Stable field identifier; enables reuse of the last prediction (or the field's "
+                    "precomputed advisory) for small input changes",
+    )
+    region: Optional[str] = Field(
+        default=None,
+        description=f"Agro-climatic region whose model set to use (or the {REGION_HEADER} header)",
+    )
 
 
 class SustainabilityPredictionRequest(BaseModel):
@@ -46,6 +77,15 @@ class SustainabilityPredictionRequest(BaseModel):
     crop_type: Literal[
         "rice", "wheat", "corn", "sugarcane", "pulses", "cotton", "other"
     ] = Field(default="other")
+    field_id: Optional[str] = Field(
+        default=None,
+        description="Stable field identifier; enables reuse of the last prediction (or the field's "
+                    "precomputed advisory) for small input changes",
+    )
+    region: Optional[str] = Field(
+        default=None,
+        description=f"Agro-climatic region whose model set to use (or the {REGION_HEADER} header)",
+    )
 
 
 class YieldPredictionRequest(BaseModel):
@@ -58,18 +98,133 @@ class YieldPredictionRequest(BaseModel):
     crop_type: Literal[
         "rice", "wheat", "corn", "sugarcane", "pulses", "cotton", "other"
     ] = Field(default="other")
+    field_id: Optional[str] = Field(
+        default=None,
+        description="Stable field identifier; enables reuse of the last prediction (or the field's "
+                    "precomputed advisory) for small input changes",
+    )
+    region: Optional[str] = Field(
+        default=None,
+        description=f"Agro-climatic region whose model set to use (or the {REGION_HEADER} header)",
+    )
+
+
+class CombinedPredictionRequest(BaseModel):
+    temperature_c: float
+    humidity_pct: float
+    soil_ph: float
+    rainfall_mm: float
+    soil_moisture_pct: float
+    fertilizer_usage_kg: float
+    pesticide_usage_kg: float
+    crop_type: Literal[
+        "rice", "wheat", "corn", "sugarcane", "pulses", "cotton", "other"
+    ] = Field(default="other")
+
+
+class CombinedBatchRequest(BaseModel):
+    records: List[CombinedPredictionRequest] = Field(..., min_length=1)
+    region: Optional[str] = None
+
+
+class InputOptimizationRequest(BaseModel):
+    temperature_c: float
+    humidity_pct: float
+    soil_ph: float
+    rainfall_mm: float
+    soil_moisture_pct: float
+    crop_type: Literal[
+        "rice", "wheat", "corn", "sugarcane", "pulses", "cotton", "other"
+    ] = Field(default="other")
+    objective: Literal["min_inputs", "max_sustainability"] = "min_inputs"
+    target_yield: Optional[float] = Field(
+        default=None, description="min_inputs: yield the inputs must still reach"
+    )
+    yield_floor: Optional[float] = Field(
+        default=None, description="max_sustainability: optional minimum yield"
+    )
+    fertilizer_bounds: Tuple[float, float] = OPTIMIZER_BOUNDS["fertilizer_usage_kg"]
+    pesticide_bounds: Tuple[float, float] = OPTIMIZER_BOUNDS["pesticide_usage_kg"]
+    region: Optional[str] = None
+
+
+class RegressionUncertainty(BaseModel):
+    samples: int
+    mean: float
+    std: float
+    quantiles: Dict[str, float]
+
+
+class CropUncertainty(BaseModel):
+    samples: int
+    votes: Dict[str, float] = Field(description="Share of dropout passes nearest each crop")
+
+
+class Explanation(BaseModel):
+    ig_steps: int
+    gradient_x_input: Dict[str, float]
+    integrated_gradients: Dict[str, float]
+    target: Optional[str] = None  # crop whose embedding distance is explained
 
 
 class CropPredictionResponse(BaseModel):
     recommended_crop: str
+    reused: Optional[bool] = None  # only set for requests with a field_id
+    uncertainty: Optional[CropUncertainty] = None
+    explanation: Optional[Explanation] = None
 
 
 class SustainabilityPredictionResponse(BaseModel):
     sustainability_score: float
+    reused: Optional[bool] = None  # only set for requests with a field_id
+    uncertainty: Optional[RegressionUncertainty] = None
+    explanation: Optional[Explanation] = None
 
 
 class YieldPredictionResponse(BaseModel):
     predicted_yield_kg_per_hectare: float
+    reused: Optional[bool] = None  # only set for requests with a field_id
+    uncertainty: Optional[RegressionUncertainty] = None
+    explanation: Optional[Explanation] = None
+
+
+class CombinedPredictionResponse(BaseModel):
+    sustainability_score: float
+    predicted_yield_kg_per_hectare: float
+    explanation: Optional[Dict[str, Explanation]] = None  # keyed by model
+
+
+class CombinedBatchResponse(BaseModel):
+    predictions: List[CombinedPredictionResponse]
+
+
+class InputPoint(BaseModel):
+    fertilizer_usage_kg: float
+    pesticide_usage_kg: float
+    predicted_yield_kg_per_hectare: float
+    sustainability_score: float
+
+
+class InputOptimizationResponse(BaseModel):
+    objective: str
+    feasible: bool  # False: no candidate met the yield threshold; best is the max-yield point
+    best: InputPoint
+    pareto_front: List[InputPoint]
+    evaluations: int
+    elapsed_ms: float
+
+
+class SimilarField(BaseModel):
+    field_id: str
+    distance: float  # Euclidean distance in the crop-model embedding space
+    nearest_crop: str  # reference crop closest to that field's embedding
+
+
+class SimilarFieldsResponse(BaseModel):
+    field_id: str
+    neighbours: List[SimilarField]
+    searched: int
+    elapsed_ms: float
 
 
 # --------------------------------------------------------------------------
@@ -115,6 +270,53 @@ def _apply_alias(payload: Dict, alias: Dict[str, str]) -> Dict:
     return {alias.get(k, k): v for k, v in payload.items()}
 
 
+def _encode_cached(model_key: str, prediction) -> Optional[float]:
+    """Shared-cache values are floats; crops are stored as CROP_TYPES indices."""
+    if model_key == "crop":
+        if prediction not in DataPreprocessor.CROP_TYPES:
+            return None  # region-specific crop outside the shared vocabulary
+        return float(DataPreprocessor.CROP_TYPES.index(prediction))
+    return float(prediction)
+
+
+async def _region_models(region: str) -> Dict[str, object]:
+    """Model set for region, loading it in the background on a miss."""
+    # Only a malformed name is the client's fault; a region that exists but
+    # fails to load is a deployment problem
+    try:
+        RegionModelCache.validate(region)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    try:
+        return await region_model_cache.get(region)
+    except FileNotFoundError as exc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
+    except Exception as exc:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail=f"Model set for region {region!r} failed to load: {exc}") from exc
+
+
+def _precomputed(field_id: str, region: Optional[str], model_key: str, features: np.ndarray):
+    """
+    Prediction from a registered field's fresh advisory, if it was scored for
+    the same region from inputs within the field-state tolerances of these.
+    """
+    scheduler = get_advisory_scheduler()
+    advisory = scheduler.store.fresh_advisory(field_id) if scheduler is not None else None
+    if advisory is None or advisory["region"] != region:
+        return None
+    scored = DataPreprocessor.normalize_for(model_key, advisory["inputs"])
+    if not field_state_store.within_tolerance(model_key, features, scored):
+        return None
+    return advisory[model_key]
+
+
+def _decode_cached(model_key: str, value: float):
+    if model_key == "crop":
+        return DataPreprocessor.CROP_TYPES[int(value)]
+    return value
+
+
 # --------------------------------------------------------------------------
 # Generic prediction helper
 # --------------------------------------------------------------------------
@@ -127,11 +329,33 @@ async def _predict(
     response_model: BaseModel,
     response_field: str,
     models: Dict[str, object],
+    uncertainty: bool = False,
+    explain: bool = False,
+    ig_steps: int = EXPLAIN_IG_STEPS,
+    region: Optional[str] = None,
 ):
+    # A region in the body wins over the header
+    region = getattr(request_data, "region", None) or region
+    if region is not None:
+        models = await _region_models(region)
+
     try:
         # Convert request to dict
         data = request_data.dict()
-        
+        field_id = store_field_id = data.pop("field_id", None)
+        data.pop("region", None)
+        crop_embeddings = models.get("crop_embeddings")
+
+        # Caches are shared across regions, so region-scope their keys, salted
+        # with the region's artifact mtimes so a redeploy invalidates them
+        if region is None:
+            cache_key = model_key
+        else:
+            scope = f"{region}:{models.get('cache_salt', '')}"
+            cache_key = f"{model_key}@{scope}"
+            if field_id is not None:
+                field_id = f"{scope}:{field_id}"
+
         # Apply field name aliases if provided
         if alias_map:
             data = _apply_alias(data, alias_map)
@@ -144,14 +368,81 @@ async def _predict(
                 detail=f"{model_key} model not available"
             )
 
+        shared_cache = get_shared_cache()
+        features = DataPreprocessor.normalize_for(model_key, data)
+        if drift_monitor is not None:
+            drift_monitor.record(model_key, features)
+
+        # Reuse the field's last prediction while its inputs stay within tolerance
+        reused = None
+        prediction = None
+        if field_id is not None:
+            prediction = field_state_store.get(field_id, model_key, features)
+            # Then the advisory precomputed for a registered field
+            if prediction is None:
+                prediction = _precomputed(store_field_id, region, model_key, features)
+            reused = prediction is not None
+
+        # Then the host-wide cache shared by all workers
+        if prediction is None and shared_cache is not None:
+            cached = shared_cache.get(cache_key, features)
+            if cached is not None:
+                prediction = _decode_cached(model_key, cached)
+
+        # Fields with an id keep their crop embedding for similar-field search
+        embedding = None
+        if model_key == "crop" and field_id is not None and not reused:
+            embedding = embed_crop(model, features)
+            store = get_field_embedding_store(region, models["cache_salt"], dim=embedding.shape[0])
+            if store is not None:
+                store.put(store_field_id, embedding)
+
         # Make prediction
-        prediction = raw_predict_fn(model, data)
-        
+        if prediction is None:
+            if embedding is not None:
+                prediction = nearest_crop(embedding, crop_embeddings)
+            elif model_key == "crop":
+                prediction = raw_predict_fn(
+                    model, data, crop_embeddings=crop_embeddings, features=features
+                )
+            else:
+                # Already normalized above for the cache keys and drift
+                prediction = raw_predict_fn(model, data, features=features)
+            encoded = _encode_cached(model_key, prediction)
+            if shared_cache is not None and encoded is not None:
+                shared_cache.put(cache_key, features, encoded)
+
+        if field_id is not None and not reused:
+            field_state_store.put(field_id, model_key, features, prediction)
+
+        # Optional MC-dropout spread around the point prediction
+        estimate = None
+        if uncertainty:
+            estimate = estimate_uncertainty(
+                model_key, model, features, crop_embeddings=crop_embeddings
+            )[0]
+
+        # Optional per-feature attributions
+        explanation = None
+        if explain:
+            targets = [prediction] if model_key == "crop" else None
+            explanation = explain_batch(
+                model_key, model, features, ig_steps,
+                crop_targets=targets, crop_embeddings=crop_embeddings,
+            )[0]
+
         # Log the prediction
         log_prediction(model_key, data, prediction)
-        
+
         # Create response with the correct field name
-        return response_model(**{response_field: prediction})
+        return response_model(
+            **{
+                response_field: prediction,
+                "reused": reused,
+                "uncertainty": estimate,
+                "explanation": explanation,
+            }
+        )
 
     except Exception as exc:
         print(f"Prediction error in {model_key}: {exc}")
@@ -169,9 +460,15 @@ async def _predict(
     "/crop",
     response_model=CropPredictionResponse,
     status_code=status.HTTP_200_OK,
+    response_model_exclude_none=True,
 )
 async def crop_endpoint(
-    req: CropPredictionRequest, models=Depends(get_models)
+    req: CropPredictionRequest,
+    uncertainty: bool = Query(default=False, description="Add MC-dropout mean/std/quantiles"),
+    explain: bool = Query(default=False, description="Add per-feature attributions"),
+    ig_steps: int = Query(default=EXPLAIN_IG_STEPS, ge=1, le=EXPLAIN_MAX_IG_STEPS),
+    x_region: Optional[str] = Header(default=None, alias=REGION_HEADER),
+    models=Depends(get_models),
 ):
     return await _predict(
         request_data=req,
@@ -181,6 +478,10 @@ async def crop_endpoint(
         response_model=CropPredictionResponse,
         response_field="recommended_crop",
         models=models,
+        uncertainty=uncertainty,
+        explain=explain,
+        ig_steps=ig_steps,
+        region=x_region,
     )
 
 
@@ -188,9 +489,15 @@ async def crop_endpoint(
     "/sustainability",
     response_model=SustainabilityPredictionResponse,
     status_code=status.HTTP_200_OK,
+    response_model_exclude_none=True,
 )
 async def sustainability_endpoint(
-    req: SustainabilityPredictionRequest, models=Depends(get_models)
+    req: SustainabilityPredictionRequest,
+    uncertainty: bool = Query(default=False, description="Add MC-dropout mean/std/quantiles"),
+    explain: bool = Query(default=False, description="Add per-feature attributions"),
+    ig_steps: int = Query(default=EXPLAIN_IG_STEPS, ge=1, le=EXPLAIN_MAX_IG_STEPS),
+    x_region: Optional[str] = Header(default=None, alias=REGION_HEADER),
+    models=Depends(get_models),
 ):
     return await _predict(
         request_data=req,
@@ -200,6 +507,10 @@ async def sustainability_endpoint(
         response_model=SustainabilityPredictionResponse,
         response_field="sustainability_score",
         models=models,
+        uncertainty=uncertainty,
+        explain=explain,
+        ig_steps=ig_steps,
+        region=x_region,
     )
 
 
@@ -207,9 +518,15 @@ async def sustainability_endpoint(
     "/yield",
     response_model=YieldPredictionResponse,
     status_code=status.HTTP_200_OK,
+    response_model_exclude_none=True,
 )
 async def yield_endpoint(
-    req: YieldPredictionRequest, models=Depends(get_models)
+    req: YieldPredictionRequest,
+    uncertainty: bool = Query(default=False, description="Add MC-dropout mean/std/quantiles"),
+    explain: bool = Query(default=False, description="Add per-feature attributions"),
+    ig_steps: int = Query(default=EXPLAIN_IG_STEPS, ge=1, le=EXPLAIN_MAX_IG_STEPS),
+    x_region: Optional[str] = Header(default=None, alias=REGION_HEADER),
+    models=Depends(get_models),
 ):
     return await _predict(
         request_data=req,
@@ -219,9 +536,145 @@ async def yield_endpoint(
         response_model=YieldPredictionResponse,
         response_field="predicted_yield_kg_per_hectare",
         models=models,
+        uncertainty=uncertainty,
+        explain=explain,
+        ig_steps=ig_steps,
+        region=x_region,
     )
 
 
+@api_router.post(
+    "/combined",
+    response_model=CombinedBatchResponse,
+    status_code=status.HTTP_200_OK,
+    response_model_exclude_none=True,
+)
+async def combined_endpoint(
+    req: CombinedBatchRequest,
+    explain: bool = Query(default=False, description="Add per-feature attributions"),
+    ig_steps: int = Query(default=EXPLAIN_IG_STEPS, ge=1, le=EXPLAIN_MAX_IG_STEPS),
+    x_region: Optional[str] = Header(default=None, alias=REGION_HEADER),
+    models=Depends(get_models),
+):
+    """Sustainability + yield for a batch of records via the fused engine."""
+    records = [record.dict() for record in req.records]
+    region = req.region or x_region
+    if region is not None:
+        models = await _region_models(region)
+    try:
+        if region is None:
+            fused = ModelLoader.load_fused(("sustainability", "yield"))
+        else:
+            fused = models["fused"]
+        predictions = predict_combined(
+            fused, records, micro_batch_size=ModelLoader.micro_batch_size("combined")
+        )
+        if explain:
+            # One vectorized attribution pass per model over the whole batch
+            for model_key in ("sustainability", "yield"):
+                features = np.stack([DataPreprocessor.normalize_for(model_key, r) for r in records])
+                explanations = explain_batch(model_key, models[model_key], features, ig_steps)
+                for prediction, explanation in zip(predictions, explanations):
+                    prediction.setdefault("explanation", {})[model_key] = explanation
+    except Exception as exc:
+        print(f"Prediction error in combined: {exc}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Prediction failed: {exc}",
+        ) from exc
+
+    log_prediction("combined", {"batch_size": len(records)}, predictions)
+    return CombinedBatchResponse(predictions=predictions)
+
+
+@api_router.post(
+    "/optimize-inputs",
+    response_model=InputOptimizationResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def optimize_inputs_endpoint(
+    req: InputOptimizationRequest,
+    x_region: Optional[str] = Header(default=None, alias=REGION_HEADER),
+    models=Depends(get_models),
+):
+    """Lowest fertilizer/pesticide for a target yield, or most sustainable above a yield floor."""
+    if req.objective == "min_inputs" and req.target_yield is None:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                            detail="target_yield is required for objective 'min_inputs'")
+    bounds = {"fertilizer_usage_kg": req.fertilizer_bounds, "pesticide_usage_kg": req.pesticide_bounds}
+    for name, (lo, hi) in bounds.items():
+        if not 0 <= lo < hi:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                                detail=f"Invalid bounds for {name}: ({lo}, {hi})")
+
+    region = req.region or x_region
+    if region is not None:
+        models = await _region_models(region)
+    if models.get("yield") is None or models.get("sustainability") is None:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                            detail="yield and sustainability models are required")
+
+    base = req.dict(exclude={"objective", "target_yield", "yield_floor",
+                             "fertilizer_bounds", "pesticide_bounds", "region"})
+    # Placeholders only; the optimizer overwrites both controls
+    base.update({name: lo for name, (lo, _) in bounds.items()})
+    threshold = req.target_yield if req.objective == "min_inputs" else req.yield_floor
+    try:
+        # ~250 ms of batched gradient steps; keep it off the event loop
+        optimizer = InputOptimizer(models["yield"], models["sustainability"])
+        result = await run_in_threadpool(
+            optimizer.optimize, base, req.objective, bounds, yield_threshold=threshold
+        )
+    except Exception as exc:
+        print(f"Input optimization error: {exc}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Optimization failed: {exc}",
+        ) from exc
+
+    log_prediction("optimize-inputs", base, result["best"])
+    return result
+
+
+@api_router.get("/similar-fields/{field_id}", response_model=SimilarFieldsResponse)
+async def similar_fields_endpoint(
+    field_id: str,
+    k: int = Query(default=10, ge=1, le=FIELD_SEARCH_MAX_K),
+    x_region: Optional[str] = Header(default=None, alias=REGION_HEADER),
+    models: Dict = Depends(get_models),
+):
+    """Fields whose conditions embed closest to this one's in the crop model's space."""
+    # Label against the same table /predict/crop uses (the bundle's, when loaded)
+    if x_region is not None:
+        models = await _region_models(x_region)
+    crop_embeddings = models.get("crop_embeddings")
+    store = get_field_embedding_store(x_region, models["cache_salt"])
+    query = store.get(field_id) if store is not None else None
+    if query is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail=f"No stored embedding for field {field_id!r}")
+
+    result = store.most_similar(query, k, exclude=field_id)
+    neighbours = [
+        {
+            "field_id": n["field_id"],
+            "distance": round(n["distance"], 4),
+            "nearest_crop": nearest_crop(n["embedding"], crop_embeddings),
+        }
+        for n in result["neighbours"]
+    ]
+    return {"field_id": field_id, "neighbours": neighbours,
+            "searched": result["searched"], "elapsed_ms": result["elapsed_ms"]}
+
+
+@api_router.get("/drift")
+async def drift_endpoint():
+    """Live input statistics and PSI/KS drift scores against the training stats."""
+    if drift_monitor is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Drift monitoring is disabled")
+    return drift_monitor.report()
+
+
 # Health check endpoint
 @api_router.get("/health")
 async def health_check():
@@ -0,0 +1,458 @@
+# src/advisories.py
+import fcntl
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from itertools import groupby
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from config import (
+    ADVISORY_ENABLED,
+    ADVISORY_DB_PATH,
+    ADVISORY_FORECAST_DIR,
+    ADVISORY_RUN_HOUR,
+    ADVISORY_POLL_INTERVAL_S,
+    ADVISORY_BATCH_SIZE,
+    ADVISORY_NICENESS,
+    ADVISORY_STALE_AFTER_S,
+    ADVISORY_RETRY_BACKOFF_S,
+    ADVISORY_RETRY_BACKOFF_MAX_S,
+)
+from src.field_embeddings import get_field_embedding_store
+from src.region_models import region_model_cache
+from src.utils import LazyImport, load_json
+
+FusedPredictor = LazyImport("src.fused_models", "FusedPredictor")
+ModelLoader = LazyImport("src.model_loader", "ModelLoader")
+predict_crop_batch = LazyImport("src.predict_torch", "predict_crop_batch")
+predict_combined = LazyImport("src.predict_torch", "predict_combined")
+
+FIELD_COLUMNS = (
+    "n", "p", "k", "temperature_c", "humidity_pct", "soil_ph", "rainfall_mm",
+    "soil_moisture_pct", "fertilizer_usage_kg", "pesticide_usage_kg", "crop_type",
+)
+# Inputs a forecast file may override; everything else is the registered value
+FORECAST_COLUMNS = ("temperature_c", "humidity_pct", "rainfall_mm", "soil_moisture_pct")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fields (
+    field_id TEXT PRIMARY KEY,
+    region TEXT,
+    n REAL, p REAL, k REAL,
+    temperature_c REAL, humidity_pct REAL, soil_ph REAL, rainfall_mm REAL,
+    soil_moisture_pct REAL, fertilizer_usage_kg REAL, pesticide_usage_kg REAL,
+    crop_type TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS fields_region ON fields (region, field_id);
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    trigger TEXT NOT NULL,
+    forecast TEXT,
+    forecast_mtime REAL,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    fields INTEGER DEFAULT 0,
+    status TEXT NOT NULL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS advisories (
+    field_id TEXT PRIMARY KEY,
+    run_id INTEGER NOT NULL,
+    recommended_crop TEXT NOT NULL,
+    sustainability_score REAL NOT NULL,
+    predicted_yield_kg_per_hectare REAL NOT NULL,
+    computed_at REAL NOT NULL,
+    inputs TEXT  -- JSON of the record scored (registered values + forecast overlay)
+);
+"""
+
+
+class AdvisoryStore:
+    """
+    SQLite store of registered fields, scoring runs and the latest advisory
+    per field. WAL mode lets request threads read while the job writes; every
+    lookup is a primary-key probe. One connection per thread.
+    """
+
+    def __init__(self, path: Path = ADVISORY_DB_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+        # Stores created before inputs were recorded
+        if "inputs" not in {row[1] for row in conn.execute("PRAGMA table_info(advisories)")}:
+            conn.execute("ALTER TABLE advisories ADD COLUMN inputs TEXT")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ------------------------------------------------------------------ fields
+    def register_fields(self, fields: Iterable[Dict]) -> int:
+        now = time.time()
+        rows = [
+            (f["field_id"], f.get("region"), *(f[c] for c in FIELD_COLUMNS), now)
+            for f in fields
+        ]
+        placeholders = ", ".join("?" * (len(FIELD_COLUMNS) + 3))
+        with self._conn() as conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO fields (field_id, region, {', '.join(FIELD_COLUMNS)}, updated_at) "
+                f"VALUES ({placeholders})",
+                rows,
+            )
+        return len(rows)
+
+    def count_fields(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM fields").fetchone()[0]
+
+    def iter_fields_by_region(self, batch_size: int) -> Iterator[Tuple[Optional[str], Iterator[Dict]]]:
+        """(region, field dicts) groups, streamed without loading every field at once."""
+        cursor = self._conn().execute("SELECT * FROM fields ORDER BY region, field_id")
+
+        def rows():
+            while True:
+                chunk = cursor.fetchmany(batch_size)
+                if not chunk:
+                    return
+                yield from (dict(row) for row in chunk)
+
+        return groupby(rows(), key=lambda row: row["region"])
+
+    # ------------------------------------------------------------------ runs
+    def start_run(self, trigger: str, forecast: Optional[str], forecast_mtime: Optional[float]) -> int:
+        with self._conn() as conn:
+            cursor = conn.execute(
+                "INSERT INTO runs (trigger, forecast, forecast_mtime, started_at, status) "
+                "VALUES (?, ?, ?, ?, 'running')",
+                (trigger, forecast, forecast_mtime, time.time()),
+            )
+        return cursor.lastrowid
+
+    def finish_run(self, run_id: int, status: str, fields: int, error: Optional[str] = None) -> None:
+        with self._conn() as conn:
+            conn.execute(
+                "UPDATE runs SET finished_at = ?, fields = ?, status = ?, error = ? WHERE run_id = ?",
+                (time.time(), fields, status, error, run_id),
+            )
+
+    def last_run(self) -> Optional[Dict]:
+        row = self._conn().execute(
+            "SELECT * FROM runs WHERE status IN ('ok', 'partial') ORDER BY run_id DESC LIMIT 1"
+        ).fetchone()
+        return dict(row) if row else None
+
+    def failures_since_success(self) -> Tuple[int, Optional[float]]:
+        """(failed runs since the last ok/partial one, when the latest of them finished)"""
+        row = self._conn().execute(
+            """
+            SELECT COUNT(*), MAX(finished_at) FROM runs
+            WHERE status = 'failed' AND run_id > COALESCE(
+                (SELECT MAX(run_id) FROM runs WHERE status IN ('ok', 'partial')), 0)
+            """
+        ).fetchone()
+        return row[0], row[1]
+
+    def recent_runs(self, limit: int = 20) -> List[Dict]:
+        rows = self._conn().execute("SELECT * FROM runs ORDER BY run_id DESC LIMIT ?", (limit,))
+        return [dict(row) for row in rows]
+
+    # ------------------------------------------------------------------ advisories
+    def write_advisories(self, run_id: int, rows: List[Tuple]) -> None:
+        """rows: (field_id, crop, sustainability, yield, scored inputs) tuples, one transaction."""
+        now = time.time()
+        with self._conn() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO advisories (field_id, run_id, recommended_crop, sustainability_score, "
+                "predicted_yield_kg_per_hectare, computed_at, inputs) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (field_id, run_id, crop, sus, yld, now, json.dumps(inputs))
+                    for field_id, crop, sus, yld, inputs in rows
+                ],
+            )
+
+    def fresh_advisory(self, field_id: str) -> Optional[Dict]:
+        """
+        Region, scored inputs and predictions of a field's advisory for the
+        request path; None unless the field is registered, scored and the
+        advisory is not stale.
+        """
+        row = self._conn().execute(
+            """
+            SELECT f.region, f.updated_at, a.recommended_crop, a.sustainability_score,
+                   a.predicted_yield_kg_per_hectare, a.computed_at, a.inputs
+            FROM fields f JOIN advisories a ON a.field_id = f.field_id
+            WHERE f.field_id = ?
+            """,
+            (field_id,),
+        ).fetchone()
+        if row is None or row["inputs"] is None:
+            return None
+        if time.time() - row["computed_at"] > ADVISORY_STALE_AFTER_S or row["updated_at"] > row["computed_at"]:
+            return None
+        return {
+            "region": row["region"],
+            "inputs": json.loads(row["inputs"]),
+            # Rounded like the live predictors
+            "crop": row["recommended_crop"],
+            "sustainability": round(row["sustainability_score"], 4),
+            "yield": round(row["predicted_yield_kg_per_hectare"], 2),
+        }
+
+    def get_advisory(self, field_id: str) -> Optional[Dict]:
+        """Advisory with freshness metadata; None when the field is not registered."""
+        row = self._conn().execute(
+            """
+            SELECT f.field_id, f.region, f.updated_at, a.recommended_crop, a.sustainability_score,
+                   a.predicted_yield_kg_per_hectare, a.computed_at, r.run_id, r.trigger, r.forecast
+            FROM fields f
+            LEFT JOIN advisories a ON a.field_id = f.field_id
+            LEFT JOIN runs r ON r.run_id = a.run_id
+            WHERE f.field_id = ?
+            """,
+            (field_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        row = dict(row)
+        if row["computed_at"] is None:
+            return {"field_id": field_id, "region": row["region"], "status": "pending"}
+        age_s = time.time() - row["computed_at"]
+        return {
+            "field_id": field_id,
+            "region": row["region"],
+            "status": "ready",
+            "recommended_crop": row["recommended_crop"],
+            "sustainability_score": round(row["sustainability_score"], 4),
+            "predicted_yield_kg_per_hectare": round(row["predicted_yield_kg_per_hectare"], 2),
+            "freshness": {
+                "computed_at": datetime.fromtimestamp(row["computed_at"]).isoformat(timespec="seconds"),
+                "age_s": round(age_s, 1),
+                "run_id": row["run_id"],
+                "trigger": row["trigger"],
+                "forecast": row["forecast"],
+                # Stale once too old, or when the field was re-registered since
+                "stale": age_s > ADVISORY_STALE_AFTER_S or row["updated_at"] > row["computed_at"],
+            },
+        }
+
+
+class AdvisoryScheduler:
+    """
+    Background job that batch-scores every registered field.
+
+    A daemon thread wakes every ADVISORY_POLL_INTERVAL_S and runs the job when
+    no run has completed today after ADVISORY_RUN_HOUR, when the newest
+    forecast file is newer than the one the last run used, or when a run was
+    requested. After failed runs the daily/forecast triggers wait
+    ADVISORY_RETRY_BACKOFF_S, doubling per consecutive failure. Workers on one host coordinate through a non-blocking fcntl
+    lock next to the database, so exactly one of them scores per trigger; the
+    run history in SQLite tells the others it is done.
+    """
+
+    def __init__(self, store: AdvisoryStore, forecast_dir: Path = ADVISORY_FORECAST_DIR,
+                 batch_size: int = ADVISORY_BATCH_SIZE):
+        self.store = store
+        self.forecast_dir = Path(forecast_dir)
+        self.batch_size = batch_size
+        self._lock_path = store.path.with_suffix(".lock")
+        self._wake = threading.Event()
+        self._requested = False
+        self._thread = None
+
+    # ------------------------------------------------------------------ triggers
+    def latest_forecast(self) -> Tuple[Optional[Path], Optional[float]]:
+        if not self.forecast_dir.is_dir():
+            return None, None
+        files = [(p.stat().st_mtime, p) for p in self.forecast_dir.glob("*.json")]
+        if not files:
+            return None, None
+        mtime, path = max(files)
+        return path, mtime
+
+    def _backing_off(self) -> bool:
+        """True while the last failed run is within its retry backoff."""
+        failures, last_failed_at = self.store.failures_since_success()
+        if not failures:
+            return False
+        backoff = min(ADVISORY_RETRY_BACKOFF_S * 2 ** (failures - 1), ADVISORY_RETRY_BACKOFF_MAX_S)
+        return time.time() < (last_failed_at or 0) + backoff
+
+    def _due_trigger(self) -> Optional[str]:
+        if self._requested:
+            return "manual"
+        # Failed runs are not "last" runs, so without this every poll retries
+        if self._backing_off():
+            return None
+        now = datetime.now()
+        last = self.store.last_run()
+        _, forecast_mtime = self.latest_forecast()
+        if forecast_mtime is not None and (last is None or (last["forecast_mtime"] or 0) < forecast_mtime):
+            return "forecast"
+        cutoff = now.replace(hour=ADVISORY_RUN_HOUR, minute=0, second=0, microsecond=0)
+        if now >= cutoff and (last is None or last["started_at"] < cutoff.timestamp()):
+            return "daily"
+        return None
+
+    def request_run(self) -> None:
+        self._requested = True
+        self._wake.set()
+
+    def start(self, interval_s: float = ADVISORY_POLL_INTERVAL_S) -> None:
+        if self._thread is not None:
+            return
+
+        def loop():
+            try:
+                # Linux applies the niceness to this thread only
+                os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), ADVISORY_NICENESS)
+            except (AttributeError, OSError):
+                pass
+            while True:
+                try:
+                    self.tick()
+                except Exception as e:
+                    print(f"Advisory scheduler error: {e}")
+                self._wake.wait(interval_s)
+                self._wake.clear()
+
+        self._thread = threading.Thread(target=loop, name="advisory-scheduler", daemon=True)
+        self._thread.start()
+
+    def tick(self) -> Optional[Dict]:
+        """Run the job if it is due and no other worker holds the lock."""
+        fd = os.open(self._lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            try:
+                fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return None  # another worker is scoring
+            # Re-check under the lock: another worker may have just finished
+            trigger = self._due_trigger()
+            if trigger is None:
+                return None
+            self._requested = False
+            return self.run(trigger)
+        finally:
+            os.close(fd)
+
+    # ------------------------------------------------------------------ scoring
+    def _forecast_inputs(self, path: Optional[Path]) -> Dict:
+        if path is None:
+            return {}
+        forecast = load_json(path)
+        return {
+            "default": forecast.get("default", {}),
+            "regions": forecast.get("regions", {}),
+            "fields": forecast.get("fields", {}),
+        }
+
+    @staticmethod
+    def _apply_forecast(field: Dict, forecast: Dict) -> Dict:
+        record = {column: field[column] for column in FIELD_COLUMNS}
+        for layer in (
+            forecast.get("default", {}),
+            forecast.get("regions", {}).get(field["region"] or "", {}),
+            forecast.get("fields", {}).get(field["field_id"], {}),
+        ):
+            record.update({c: float(layer[c]) for c in FORECAST_COLUMNS if c in layer})
+        return record
+
+    @staticmethod
+    def _models_for(region: Optional[str]) -> Tuple[Dict, "FusedPredictor"]:
+        if region is None:
+            return ModelLoader.load_models(), ModelLoader.load_fused(("sustainability", "yield"))
+        # Not a serving request: no hit/miss accounting, no LRU promotion
+        models = region_model_cache.borrow(region)
+        return models, models["fused"]
+
+    def _score_batch(self, run_id: int, region: Optional[str], models: Dict,
+                     fused: "FusedPredictor", fields: List[Dict], forecast: Dict) -> None:
+        records = [self._apply_forecast(field, forecast) for field in fields]
+        # Same tuned micro-batch sizes as the serving paths
+        crops, embeddings = predict_crop_batch(
+            models["crop"], records, models.get("crop_embeddings"),
+            micro_batch_size=ModelLoader.micro_batch_size("crop"),
+        )
+        outputs = predict_combined(fused, records, micro_batch_size=ModelLoader.micro_batch_size("combined"))
+        field_ids = [field["field_id"] for field in fields]
+        self.store.write_advisories(run_id, [
+            (field_id, crop, output["sustainability_score"], output["predicted_yield_kg_per_hectare"], record)
+            for field_id, crop, output, record in zip(field_ids, crops, outputs, records)
+        ])
+        embedding_store = get_field_embedding_store(region, models["cache_salt"], dim=embeddings.shape[1])
+        if embedding_store is not None:
+            embedding_store.put_many(field_ids, embeddings)
+
+    def run(self, trigger: str) -> Dict:
+        forecast_path, forecast_mtime = self.latest_forecast()
+        forecast = self._forecast_inputs(forecast_path)
+        run_id = self.store.start_run(trigger, forecast_path.name if forecast_path else None, forecast_mtime)
+        start = time.perf_counter()
+        scored, failed_regions = 0, []
+        print(f"Advisory run {run_id} ({trigger}) started for {self.store.count_fields()} fields")
+        try:
+            for region, fields in self.store.iter_fields_by_region(self.batch_size):
+                try:
+                    models, fused = self._models_for(region)
+                except Exception as e:
+                    print(f"Advisory run {run_id}: no models for region {region}: {e}")
+                    failed_regions.append(region)
+                    continue
+                batch = []
+                for field in fields:
+                    batch.append(field)
+                    if len(batch) == self.batch_size:
+                        self._score_batch(run_id, region, models, fused, batch, forecast)
+                        scored += len(batch)
+                        batch = []
+                        time.sleep(0)  # let request threads take the GIL between batches
+                if batch:
+                    self._score_batch(run_id, region, models, fused, batch, forecast)
+                    scored += len(batch)
+        except Exception as e:
+            self.store.finish_run(run_id, "failed", scored, str(e))
+            print(f"Advisory run {run_id} failed after {scored} fields: {e}")
+            raise
+
+        # Nothing scored because every region failed counts as a failed run (retried with backoff)
+        if failed_regions and scored == 0:
+            status = "failed"
+        else:
+            status = "partial" if failed_regions else "ok"
+        error = f"no models for regions: {failed_regions}" if failed_regions else None
+        self.store.finish_run(run_id, status, scored, error)
+        elapsed = time.perf_counter() - start
+        print(f"Advisory run {run_id} scored {scored} fields in {elapsed:.1f} s ({status})")
+        return {"run_id": run_id, "trigger": trigger, "status": status, "fields": scored,
+                "elapsed_s": round(elapsed, 2)}
+
+
+_scheduler = None
+_scheduler_failed = False
+_scheduler_lock = threading.Lock()
+
+
+def get_advisory_scheduler() -> Optional[AdvisoryScheduler]:
+    """Open the advisory store on first use; None when disabled or unavailable."""
+    global _scheduler, _scheduler_failed
+    with _scheduler_lock:
+        if _scheduler is None and ADVISORY_ENABLED and not _scheduler_failed:
+            try:
+                _scheduler = AdvisoryScheduler(AdvisoryStore())
+            except (OSError, sqlite3.Error) as e:
+                print(f"Advisory store unavailable at {ADVISORY_DB_PATH}: {e}")
+                _scheduler_failed = True
+        return _scheduler
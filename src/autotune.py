@@ -0,0 +1,209 @@
+"""
+src/autotune.py
+---------------
+Benchmark the serving models on this machine and write a tuned profile.
+
+    python -m src.autotune [--output PATH] [--duration 0.2] [--quick]
+
+For every combination of intra-op threads, inter-op threads and worker count
+that fits the available cores, `workers` fresh processes run concurrently and
+time each model (plus the fused sustainability+yield path) at every batch size
+in AUTOTUNE_BATCH_SIZES. The winning combination maximises aggregate
+throughput at the best batch size whose p50 latency stays within
+AUTOTUNE_LATENCY_BUDGET_MS; ModelLoader applies it at startup.
+"""
+import argparse
+import math
+import multiprocessing as mp
+import os
+import platform
+import statistics
+import time
+from datetime import datetime
+
+import torch
+
+from config import (
+    MODEL_PATHS,
+    TUNED_PROFILE_PATH,
+    AUTOTUNE_BATCH_SIZES,
+    AUTOTUNE_LATENCY_BUDGET_MS,
+)
+from src.utils import save_json
+
+MODEL_INPUT_SIZES = {"crop": 17, "sustainability": 10, "yield": 10}
+
+
+# ------------------------------------------------------------------ child side
+def _load_or_synthesize(model_key):
+    """Load the checkpoint for model_key, or random weights of the same shape."""
+    from src.model_definitions import CropEmbeddingModel, SustainabilityPredictor, YieldPredictor
+
+    model_classes = {
+        "crop": CropEmbeddingModel,
+        "sustainability": SustainabilityPredictor,
+        "yield": YieldPredictor,
+    }
+    path = MODEL_PATHS[model_key]
+    if path.exists():
+        checkpoint = torch.load(path, map_location="cpu", weights_only=False)
+        state_dict = checkpoint["model_state_dict"]
+        kwargs = {"input_size": state_dict["fc1.weight"].shape[1]}
+        if model_key == "crop":
+            kwargs["embedding_size"] = checkpoint.get("embedding_size", 64)
+        model = model_classes[model_key](**kwargs)
+        model.load_state_dict(state_dict)
+    else:
+        model = model_classes[model_key](input_size=MODEL_INPUT_SIZES[model_key])
+    return model.cpu().eval()
+
+
+def _time_model(model, input_size, batch_size, duration_s):
+    x = torch.randn(batch_size, input_size)
+    with torch.no_grad():
+        for _ in range(10):
+            model(x)
+        latencies = []
+        deadline = time.perf_counter() + duration_s
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            model(x)
+            latencies.append(time.perf_counter() - start)
+    return {
+        "rows_per_s": batch_size * len(latencies) / sum(latencies),
+        "p50_ms": statistics.median(latencies) * 1e3,
+    }
+
+
+def _worker(queue, num_threads, num_interop_threads, batch_sizes, duration_s):
+    """Runs in a fresh spawned process so the thread settings take effect."""
+    from src.fused_models import FusedPredictor
+
+    torch.set_num_threads(num_threads)
+    torch.set_num_interop_threads(num_interop_threads)
+
+    models = {key: _load_or_synthesize(key) for key in MODEL_PATHS}
+    input_sizes = {key: model.fc1.in_features for key, model in models.items()}
+    models["combined"] = FusedPredictor({k: models[k] for k in ("sustainability", "yield")})
+    input_sizes["combined"] = models["combined"].w0.shape[1]
+
+    results = {
+        key: {str(b): _time_model(model, input_sizes[key], b, duration_s) for b in batch_sizes}
+        for key, model in models.items()
+    }
+    queue.put(results)
+
+
+# ------------------------------------------------------------------ parent side
+def _powers_of_two(limit):
+    values, v = [], 1
+    while v <= limit:
+        values.append(v)
+        v *= 2
+    if values[-1] != limit:
+        values.append(limit)
+    return values
+
+
+def candidate_settings(cpu_count, quick=False):
+    """(num_threads, num_interop_threads, workers) combinations that fit cpu_count."""
+    settings = []
+    for threads in _powers_of_two(cpu_count):
+        for workers in _powers_of_two(max(1, cpu_count // threads)):
+            for interop in ([1] if quick else [1, 2]):
+                if threads * workers <= cpu_count:
+                    settings.append((threads, interop, workers))
+    return settings
+
+
+def run_setting(num_threads, num_interop_threads, workers, batch_sizes, duration_s):
+    """Benchmark one setting; returns per-model, per-batch aggregate stats."""
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    procs = [
+        ctx.Process(target=_worker, args=(queue, num_threads, num_interop_threads, batch_sizes, duration_s))
+        for _ in range(workers)
+    ]
+    for proc in procs:
+        proc.start()
+    per_worker = [queue.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+
+    aggregate = {}
+    for model_key in per_worker[0]:
+        aggregate[model_key] = {}
+        for batch in per_worker[0][model_key]:
+            stats = [result[model_key][batch] for result in per_worker]
+            aggregate[model_key][batch] = {
+                "rows_per_s": sum(s["rows_per_s"] for s in stats),
+                "p50_ms": max(s["p50_ms"] for s in stats),
+            }
+    return aggregate
+
+
+def _best_batch(per_batch, latency_budget_ms):
+    """Batch size with the highest throughput whose p50 latency fits the budget."""
+    within = {b: s for b, s in per_batch.items() if s["p50_ms"] <= latency_budget_ms}
+    if not within:
+        within = {min(per_batch, key=int): per_batch[min(per_batch, key=int)]}
+    batch = max(within, key=lambda b: within[b]["rows_per_s"])
+    return int(batch), within[batch]["rows_per_s"]
+
+
+def autotune(batch_sizes=AUTOTUNE_BATCH_SIZES, duration_s=0.2, quick=False,
+             latency_budget_ms=AUTOTUNE_LATENCY_BUDGET_MS):
+    cpu_count = os.cpu_count() or 1
+    runs = []
+    for threads, interop, workers in candidate_settings(cpu_count, quick=quick):
+        print(f"Benchmarking threads={threads} interop={interop} workers={workers} ...")
+        aggregate = run_setting(threads, interop, workers, batch_sizes, duration_s)
+        best = {key: _best_batch(per_batch, latency_budget_ms) for key, per_batch in aggregate.items()}
+        # Geometric mean so no single model dominates the choice
+        score = math.exp(statistics.fmean(math.log(rows) for _, rows in best.values()))
+        runs.append({
+            "num_threads": threads,
+            "num_interop_threads": interop,
+            "workers": workers,
+            "score_rows_per_s": score,
+            "micro_batch_size": {key: batch for key, (batch, _) in best.items()},
+            "results": aggregate,
+        })
+        print(f"  score={score:,.0f} rows/s")
+
+    winner = max(runs, key=lambda run: run["score_rows_per_s"])
+    return {
+        "created_at": datetime.now().isoformat(),
+        "machine": {
+            "cpu_count": cpu_count,
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "torch_version": torch.__version__,
+        },
+        "latency_budget_ms": latency_budget_ms,
+        "num_threads": winner["num_threads"],
+        "num_interop_threads": winner["num_interop_threads"],
+        "workers": winner["workers"],
+        "micro_batch_size": winner["micro_batch_size"],
+        "runs": runs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Autotune thread counts and batch sizes for this machine")
+    parser.add_argument("--output", default=str(TUNED_PROFILE_PATH))
+    parser.add_argument("--duration", type=float, default=0.2, help="seconds per model/batch measurement")
+    parser.add_argument("--quick", action="store_true", help="skip the inter-op thread sweep")
+    args = parser.parse_args()
+
+    profile = autotune(duration_s=args.duration, quick=args.quick)
+    save_json(profile, args.output)
+    print(
+        f"Wrote {args.output}: threads={profile['num_threads']} "
+        f"interop={profile['num_interop_threads']} workers={profile['workers']} "
+        f"micro_batch_size={profile['micro_batch_size']}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -44,6 +44,57 @@ class DataPreprocessor:
         'rice', 'wheat', 'corn', 'sugarcane', 'pulses', 'cotton', 'other'
     ]
     
+    # model_key -> (class attribute prefix, expected feature order)
+    STATS_LAYOUT = {
+        'crop': ('CROP', CROP_FEATURES),
+        'sustainability': ('SUSTAINABILITY', SUSTAINABILITY_FEATURES),
+        'yield': ('YIELD', YIELD_FEATURES),
+    }
+
+    @classmethod
+    def current_stats(cls) -> dict:
+        """model_key -> (feature order, mean, std) currently in use"""
+        return {
+            model_key: (list(features), getattr(cls, f'{prefix}_MEAN'), getattr(cls, f'{prefix}_STD'))
+            for model_key, (prefix, features) in cls.STATS_LAYOUT.items()
+        }
+
+    @classmethod
+    def matches_stats(cls, stats: dict) -> bool:
+        """True when stats equal the constants in use (up to float32 rounding)"""
+        current = cls.current_stats()
+        return all(
+            list(features) == current[model_key][0]
+            and np.allclose(mean, current[model_key][1], rtol=1e-5, atol=1e-6)
+            and np.allclose(std, current[model_key][2], rtol=1e-5, atol=1e-6)
+            for model_key, (features, mean, std) in stats.items()
+        )
+
+    @classmethod
+    def validate_stats(cls, stats: dict) -> None:
+        """Raise ValueError unless every entry of stats could be loaded"""
+        for model_key, (features, mean, std) in stats.items():
+            if model_key not in cls.STATS_LAYOUT:
+                raise ValueError(f"Unknown model key: {model_key}")
+            expected = cls.STATS_LAYOUT[model_key][1]
+            if list(features) != list(expected):
+                raise ValueError(f"{model_key} feature order does not match config")
+            if np.shape(mean) != (len(expected),) or np.shape(std) != (len(expected),):
+                raise ValueError(f"{model_key} mean/std do not have {len(expected)} entries")
+
+    @classmethod
+    def load_stats(cls, stats: dict) -> None:
+        """
+        Replace the normalization constants, e.g. with a model bundle's
+        preprocessing_stats(): model_key -> (feature order, mean, std).
+        Everything is validated before any constant changes.
+        """
+        cls.validate_stats(stats)
+        for model_key, (_, mean, std) in stats.items():
+            prefix = cls.STATS_LAYOUT[model_key][0]
+            setattr(cls, f'{prefix}_MEAN', np.asarray(mean, dtype=np.float64))
+            setattr(cls, f'{prefix}_STD', np.asarray(std, dtype=np.float64))
+
     @staticmethod
     def normalize_crop_input(data: dict) -> np.ndarray:
         """Normalize crop recommendation input features"""
@@ -132,8 +183,20 @@ class DataPreprocessor:
         # Combine all features (6 numeric + 4 one-hot = 10 total)
         all_features = np.concatenate([numeric_features, crop_onehot])
         
-        return (all_features - DataPreprocessor.YIELD_MEAN) / DataPreprocessor.YIELD_STD 
- 
+        return (all_features - DataPreprocessor.YIELD_MEAN) / DataPreprocessor.YIELD_STD
+
+    @staticmethod
+    def normalize_for(model_key: str, data: dict) -> np.ndarray:
+        """Normalize input features for the model registered under model_key"""
+        normalizers = {
+            'crop': DataPreprocessor.normalize_crop_input,
+            'sustainability': DataPreprocessor.normalize_sustainability_input,
+            'yield': DataPreprocessor.normalize_yield_input,
+        }
+        if model_key not in normalizers:
+            raise ValueError(f"Unknown model key: {model_key}")
+        return normalizers[model_key](data)
+
     @staticmethod
     def _encode_soil_type(soil_type: str) -> int:
         """Encode soil type to numerical value"""
@@ -0,0 +1,186 @@
+# src/drift.py
+import math
+import threading
+from typing import Dict, List
+
+import numpy as np
+
+from config import (
+    DRIFT_ENABLED,
+    DRIFT_HIST_RANGE,
+    DRIFT_HIST_BUCKETS,
+    DRIFT_FLUSH_INTERVAL_S,
+    DRIFT_FLUSH_BATCH,
+)
+from src.data_preprocessing import DataPreprocessor
+
+_EPS = 1e-6
+
+
+def _training_stats(model_key: str):
+    # Read at construction time, so a reset() picks up stats loaded since
+    return DataPreprocessor.current_stats()[model_key]
+
+
+def _normal_cdf(x: np.ndarray) -> np.ndarray:
+    return 0.5 * (1.0 + np.vectorize(math.erf)(x / math.sqrt(2.0)))
+
+
+class FeatureStats:
+    """
+    Running statistics over normalized inputs of one model.
+
+    Mean/variance use Welford's update in its batched form (Chan et al.), and
+    each feature has a fixed-bucket histogram over [-range, range] z-units
+    plus underflow/overflow buckets, so updates are a handful of numpy ops per
+    batch regardless of how many rows it holds.
+    """
+
+    def __init__(self, model_key: str, hist_range: float = DRIFT_HIST_RANGE,
+                 n_buckets: int = DRIFT_HIST_BUCKETS):
+        self.model_key = model_key
+        self.feature_names, train_mean, train_std = _training_stats(model_key)
+        n_features = len(self.feature_names)
+        self.edges = np.linspace(-hist_range, hist_range, n_buckets + 1)
+        self.count = 0
+        self.mean = np.zeros(n_features)
+        self.m2 = np.zeros(n_features)
+        self.hist = np.zeros((n_features, n_buckets + 2), dtype=np.int64)
+        self.reference = self._reference_histogram(train_mean, train_std)
+
+    def _reference_histogram(self, train_mean: np.ndarray, train_std: np.ndarray) -> np.ndarray:
+        """
+        Expected bucket probabilities under the training statistics.
+
+        Only mean/std survive from training, so numeric features are taken as
+        Gaussian (standard normal once normalized). One-hot crop flags are
+        Bernoulli with p = training mean, i.e. two point masses.
+        """
+        cdf = np.concatenate([[0.0], _normal_cdf(self.edges), [1.0]])
+        gaussian = np.diff(cdf)
+        reference = np.tile(gaussian, (len(self.feature_names), 1))
+        for i, name in enumerate(self.feature_names):
+            if name.startswith("crop_"):
+                p = float(train_mean[i])
+                reference[i] = 0.0
+                for value, mass in ((0.0, 1.0 - p), (1.0, p)):
+                    z = (value - train_mean[i]) / train_std[i]
+                    reference[i, np.searchsorted(self.edges, z, side="right")] += mass
+        return reference
+
+    def update(self, batch: np.ndarray) -> None:
+        n = batch.shape[0]
+        if n == 0:
+            return
+        batch_mean = batch.mean(axis=0)
+        batch_m2 = ((batch - batch_mean) ** 2).sum(axis=0)
+        total = self.count + n
+        delta = batch_mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += batch_m2 + delta ** 2 * self.count * n / total
+        self.count = total
+
+        n_bins = self.hist.shape[1]
+        idx = np.searchsorted(self.edges, batch, side="right")           # (N, F) in 0..n_buckets+1
+        flat = idx + np.arange(batch.shape[1]) * n_bins
+        self.hist += np.bincount(flat.ravel(), minlength=self.hist.size).reshape(self.hist.shape)
+
+    def report(self) -> Dict:
+        if self.count == 0:
+            return {"count": 0, "features": {}}
+        live = self.hist / self.count
+        expected = self.reference
+        psi = ((live - expected) * np.log((live + _EPS) / (expected + _EPS))).sum(axis=1)
+        ks = np.abs(np.cumsum(live, axis=1) - np.cumsum(expected, axis=1)).max(axis=1)
+        std = np.sqrt(self.m2 / max(self.count - 1, 1))
+        features = {}
+        for i, name in enumerate(self.feature_names):
+            features[name] = {
+                "mean_z": round(float(self.mean[i]), 4),
+                "std_ratio": round(float(std[i]), 4),
+                "psi": round(float(psi[i]), 4),
+                "ks": round(float(ks[i]), 4),
+                "status": _psi_status(psi[i]),
+            }
+        return {
+            "count": self.count,
+            "max_psi": round(float(psi.max()), 4),
+            "features": features,
+        }
+
+
+def _psi_status(psi: float) -> str:
+    # Conventional PSI bands
+    if psi < 0.1:
+        return "stable"
+    if psi < 0.25:
+        return "moderate"
+    return "significant"
+
+
+class DriftMonitor:
+    """
+    Collects normalized inputs on the request path and folds them into
+    FeatureStats from a background thread.
+
+    record() only appends a reference to a list under a lock; the vectorized
+    update runs every DRIFT_FLUSH_INTERVAL_S or once DRIFT_FLUSH_BATCH rows
+    are pending, and before every report.
+    """
+
+    def __init__(self, model_keys=("crop", "sustainability", "yield")):
+        self._stats = {key: FeatureStats(key) for key in model_keys}
+        self._pending: Dict[str, List[np.ndarray]] = {key: [] for key in model_keys}
+        self._n_pending = 0
+        self._pending_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def record(self, model_key: str, features: np.ndarray) -> None:
+        with self._pending_lock:
+            self._pending[model_key].append(features)
+            self._n_pending += 1
+            full = self._n_pending >= DRIFT_FLUSH_BATCH
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="drift-monitor", daemon=True)
+                self._thread.start()
+        if full:
+            self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(DRIFT_FLUSH_INTERVAL_S)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> None:
+        with self._pending_lock:
+            pending = self._pending
+            self._pending = {key: [] for key in pending}
+            self._n_pending = 0
+        with self._stats_lock:
+            for model_key, rows in pending.items():
+                if rows:
+                    self._stats[model_key].update(np.atleast_2d(np.stack(rows)).astype(np.float64))
+
+    def reset(self) -> None:
+        """
+        Rebuild every reference histogram from the normalization stats in use
+        and drop what was collected so far. Called once a model bundle's stats
+        replace the built-in ones: rows normalized with the old stats would
+        not be comparable.
+        """
+        with self._pending_lock:
+            self._pending = {key: [] for key in self._pending}
+            self._n_pending = 0
+        with self._stats_lock:
+            self._stats = {key: FeatureStats(key) for key in self._stats}
+
+    def report(self) -> Dict:
+        self.flush()
+        with self._stats_lock:
+            return {key: stats.report() for key, stats in self._stats.items()}
+
+
+drift_monitor = DriftMonitor() if DRIFT_ENABLED else None
@@ -0,0 +1,86 @@
+# src/explain.py
+from typing import Dict, List, Optional
+
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.func import functional_call, jacrev, vmap
+
+from config import CROP_EMBEDDINGS, CROP_FEATURES, SUSTAINABILITY_FEATURES, YIELD_FEATURES
+
+FEATURE_NAMES = {
+    "crop": CROP_FEATURES,
+    "sustainability": SUSTAINABILITY_FEATURES,
+    "yield": YIELD_FEATURES,
+}
+
+
+def _per_sample_fn(model_key: str, model: nn.Module):
+    """
+    Scalar output of one sample, f(x, ref) with x of shape (F,).
+
+    Regression models explain their prediction. The crop model explains the
+    negative distance to the recommended crop's reference embedding, i.e. what
+    pulled the field towards that crop.
+    """
+    params = {name: p.detach() for name, p in model.named_parameters()}
+    buffers = {name: b.detach() for name, b in model.named_buffers()}
+
+    def f(x, ref):
+        out = functional_call(model, (params, buffers), (x.unsqueeze(0),)).squeeze(0)
+        if model_key == "crop":
+            return -torch.linalg.vector_norm(out - ref)
+        return out[0]
+
+    return f
+
+
+def explain_batch(model_key: str, model: nn.Module, features: np.ndarray, ig_steps: int,
+                  crop_targets: Optional[List[str]] = None,
+                  crop_embeddings: Optional[Dict] = None) -> List[Dict]:
+    """
+    Gradient×input and integrated-gradient attributions for a (B, F) batch.
+
+    Inputs are the normalized features, so the all-zero IG baseline is the
+    training mean and attributions read as "contribution relative to a typical
+    field". All B·ig_steps gradients come from one vmap(jacrev(f)) call.
+    """
+    features = np.atleast_2d(np.asarray(features, dtype=np.float32))
+    batch_size, n_features = features.shape
+    device = next(model.parameters()).device
+    x = torch.from_numpy(features).to(device)
+
+    if model_key == "crop":
+        if crop_targets is None or len(crop_targets) != batch_size:
+            raise ValueError("crop explanations need one target crop per row")
+        embeddings = crop_embeddings or CROP_EMBEDDINGS
+        refs = torch.from_numpy(
+            np.stack([embeddings[name] for name in crop_targets]).astype(np.float32)
+        ).to(device)
+    else:
+        refs = torch.zeros(batch_size, 1, device=device)  # unused by f
+
+    grad_fn = vmap(jacrev(_per_sample_fn(model_key, model), argnums=0))
+
+    # Integrated gradients: midpoint Riemann sum along baseline (0) → x
+    alphas = (torch.arange(ig_steps, device=device, dtype=x.dtype) + 0.5) / ig_steps
+    path = alphas.view(1, -1, 1) * x.unsqueeze(1)                     # (B, S, F)
+    points = torch.cat([x, path.reshape(-1, n_features)])              # (B + B·S, F)
+    point_refs = torch.cat([refs, refs.repeat_interleave(ig_steps, dim=0)])
+    grads = grad_fn(points, point_refs)
+
+    grad_x_input = (grads[:batch_size] * x).cpu().numpy()
+    integrated = (grads[batch_size:].reshape(batch_size, ig_steps, n_features).mean(dim=1) * x).cpu().numpy()
+
+    names = FEATURE_NAMES[model_key]
+    explanations = []
+    for i in range(batch_size):
+        explanation = {
+            "ig_steps": ig_steps,
+            "gradient_x_input": {n: round(float(v), 6) for n, v in zip(names, grad_x_input[i])},
+            "integrated_gradients": {n: round(float(v), 6) for n, v in zip(names, integrated[i])},
+        }
+        if model_key == "crop":
+            explanation["target"] = crop_targets[i]
+        explanations.append(explanation)
+    return explanations
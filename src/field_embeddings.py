@@ -0,0 +1,259 @@
+# src/field_embeddings.py
+import fcntl
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from config import (
+    FIELD_EMBEDDINGS_ENABLED,
+    FIELD_EMBEDDINGS_DIR,
+    FIELD_EMBEDDINGS_QUANTIZE,
+    FIELD_EMBEDDINGS_GROW_ROWS,
+    FIELD_SEARCH_BLOCK_ROWS,
+)
+
+STORE_VERSION = 1
+
+
+class FieldEmbeddingStore:
+    """
+    Append-mostly, memory-mapped store of one embedding per field.
+
+    Files in the store directory:
+      meta.json    dim, dtype and layout version
+      vectors.bin  (capacity, dim) int8 or float32 rows
+      rows.bin     (capacity, 2) float32: per-row dequantization scale, |v|²
+      ids.log      one JSON-encoded field_id per line, in row order
+
+    A field keeps its row for life: re-embedding a known field overwrites it
+    in place, new fields append. Row data is written before the id line, so
+    every row listed in ids.log is complete. Writers serialize on an fcntl
+    lock and any process (e.g. other uvicorn workers) picks up new rows by
+    tailing ids.log, so the mapped files are shared through the page cache.
+    """
+
+    def __init__(self, directory: Path, dim: int = 64, quantize: bool = FIELD_EMBEDDINGS_QUANTIZE,
+                 grow_rows: int = FIELD_EMBEDDINGS_GROW_ROWS):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.grow_rows = grow_rows
+        self._lock = threading.Lock()
+
+        meta_path = self.directory / "meta.json"
+        if meta_path.exists():
+            meta = json.loads(meta_path.read_text())
+            if meta.get("version") != STORE_VERSION:
+                raise ValueError(f"Unsupported field embedding store version in {self.directory}")
+        else:
+            meta = {"version": STORE_VERSION, "dim": dim, "dtype": "int8" if quantize else "float32"}
+            tmp = meta_path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(meta))
+            os.replace(tmp, meta_path)
+        self.dim = int(meta["dim"])
+        self.dtype = np.dtype(meta["dtype"])
+
+        self._lock_fd = os.open(self.directory / ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+        self._vectors_fd = os.open(self.directory / "vectors.bin", os.O_RDWR | os.O_CREAT, 0o644)
+        self._rows_fd = os.open(self.directory / "rows.bin", os.O_RDWR | os.O_CREAT, 0o644)
+        self._ids_path = self.directory / "ids.log"
+        self._ids_path.touch()
+
+        self._ids: List[str] = []
+        self._index: Dict[str, int] = {}
+        self._ids_offset = 0
+        self._capacity = 0
+        self._vectors = None
+        self._rows = None
+        with self._lock:
+            self._refresh_locked()
+
+    # ------------------------------------------------------------------ files
+    def _map_locked(self) -> None:
+        capacity = os.fstat(self._rows_fd).st_size // 8
+        if capacity == self._capacity:
+            return
+        self._capacity = capacity
+        if capacity == 0:
+            self._vectors = self._rows = None
+            return
+        self._vectors = np.memmap(self.directory / "vectors.bin", dtype=self.dtype,
+                                  mode="r+", shape=(capacity, self.dim))
+        self._rows = np.memmap(self.directory / "rows.bin", dtype=np.float32,
+                               mode="r+", shape=(capacity, 2))
+
+    def _ensure_capacity_locked(self, rows: int) -> None:
+        if rows <= self._capacity:
+            return
+        capacity = -(-rows // self.grow_rows) * self.grow_rows
+        os.ftruncate(self._vectors_fd, capacity * self.dim * self.dtype.itemsize)
+        os.ftruncate(self._rows_fd, capacity * 8)
+        self._map_locked()
+
+    def _refresh_locked(self) -> None:
+        """Pick up rows appended by other processes since the last look."""
+        with open(self._ids_path, "rb") as f:
+            f.seek(self._ids_offset)
+            chunk = f.read()
+        end = chunk.rfind(b"\n") + 1  # ignore a line still being written
+        for line in chunk[:end].splitlines():
+            field_id = json.loads(line)
+            self._index[field_id] = len(self._ids)
+            self._ids.append(field_id)
+        self._ids_offset += end
+        self._map_locked()
+
+    def _encode(self, vectors: np.ndarray):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if self.dtype == np.int8:
+            scale = np.abs(vectors).max(axis=1) / 127.0
+            scale[scale == 0] = 1.0
+            stored = np.clip(np.rint(vectors / scale[:, None]), -127, 127).astype(np.int8)
+            decoded = stored.astype(np.float32) * scale[:, None]
+        else:
+            scale = np.ones(len(vectors), dtype=np.float32)
+            stored = decoded = vectors
+        # |v|² of what is actually stored keeps distances consistent with the rows
+        return stored, np.stack([scale, (decoded ** 2).sum(axis=1)], axis=1).astype(np.float32)
+
+    # ------------------------------------------------------------------ writes
+    def put(self, field_id: str, vector: np.ndarray) -> None:
+        self.put_many([field_id], np.asarray(vector).reshape(1, -1))
+
+    def put_many(self, field_ids: Sequence[str], vectors: np.ndarray) -> None:
+        """Insert or overwrite one row per field_id; new fields are appended in one write."""
+        stored, rows = self._encode(vectors)
+        if len(stored) != len(field_ids):
+            raise ValueError("field_ids and vectors differ in length")
+        with self._lock:
+            fcntl.lockf(self._lock_fd, fcntl.LOCK_EX)
+            try:
+                self._refresh_locked()
+                positions, new_rows = [], {}
+                for field_id in field_ids:
+                    row = self._index.get(field_id)
+                    if row is None:
+                        row = new_rows.setdefault(field_id, len(self._ids) + len(new_rows))
+                    positions.append(row)
+                new_ids = list(new_rows)
+                self._ensure_capacity_locked(len(self._ids) + len(new_ids))
+                positions = np.asarray(positions)
+                self._vectors[positions] = stored
+                self._rows[positions] = rows
+                if new_ids:
+                    lines = "".join(json.dumps(field_id) + "\n" for field_id in new_ids).encode()
+                    with open(self._ids_path, "ab") as f:
+                        f.write(lines)
+                    for field_id in new_ids:
+                        self._index[field_id] = len(self._ids)
+                        self._ids.append(field_id)
+                    self._ids_offset += len(lines)
+            finally:
+                fcntl.lockf(self._lock_fd, fcntl.LOCK_UN)
+
+    # ------------------------------------------------------------------ reads
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def get(self, field_id: str) -> Optional[np.ndarray]:
+        with self._lock:
+            self._refresh_locked()
+            row = self._index.get(field_id)
+            if row is None:
+                return None
+            return self._vectors[row].astype(np.float32) * self._rows[row, 0]
+
+    def most_similar(self, query: np.ndarray, k: int, exclude: Optional[str] = None,
+                     block_rows: int = FIELD_SEARCH_BLOCK_ROWS) -> Dict:
+        """
+        k nearest stored fields to query by Euclidean distance.
+
+        |v - q|² = |v|² - 2·scale·(q_int8 · q) + |q|², scored block by block
+        with one matmul each; every block keeps its own top-k via
+        argpartition and the block winners are merged at the end.
+        """
+        start_time = time.perf_counter()
+        with self._lock:
+            self._refresh_locked()
+            n = len(self._ids)
+            vectors, rows, ids = self._vectors, self._rows, self._ids
+            skip = self._index.get(exclude) if exclude is not None else None
+
+        query = np.asarray(query, dtype=np.float32).reshape(self.dim)
+        best_rows, best_dists = [], []
+        for start in range(0, n, block_rows):
+            end = min(start + block_rows, n)
+            dots = vectors[start:end].astype(np.float32) @ query
+            dists = rows[start:end, 1] - 2.0 * rows[start:end, 0] * dots
+            if skip is not None and start <= skip < end:
+                dists[skip - start] = np.inf
+            if len(dists) > k:
+                top = np.argpartition(dists, k)[:k]
+            else:
+                top = np.arange(len(dists))
+            best_rows.append(top + start)
+            best_dists.append(dists[top])
+
+        neighbours = []
+        if best_rows:
+            candidates = np.concatenate(best_rows)
+            dists = np.concatenate(best_dists)
+            order = np.argsort(dists, kind="stable")[:k]
+            sq_query = float(query @ query)
+            for i in order:
+                if not np.isfinite(dists[i]):
+                    continue
+                row = int(candidates[i])
+                neighbours.append({
+                    "field_id": ids[row],
+                    "distance": float(np.sqrt(max(dists[i] + sq_query, 0.0))),
+                    "embedding": vectors[row].astype(np.float32) * rows[row, 0],
+                })
+        return {
+            "neighbours": neighbours,
+            "searched": n,
+            "elapsed_ms": round((time.perf_counter() - start_time) * 1e3, 2),
+        }
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._refresh_locked()
+            return {
+                "fields": len(self._ids),
+                "capacity": self._capacity,
+                "dim": self.dim,
+                "dtype": self.dtype.name,
+                "bytes": self._capacity * (self.dim * self.dtype.itemsize + 8),
+            }
+
+
+_stores: Dict[str, Optional[FieldEmbeddingStore]] = {}
+_stores_lock = threading.Lock()
+
+
+def get_field_embedding_store(region: Optional[str], model_stamp: str,
+                              dim: int = 64) -> Optional[FieldEmbeddingStore]:
+    """
+    Store for the global crop model or one region's model (embedding spaces
+    differ between them). model_stamp is the model set's cache_salt: a
+    retrained or redeployed crop model gets a fresh store rather than mixing
+    its vectors with the old embedding space. None when disabled or the
+    directory is unusable.
+    """
+    if not FIELD_EMBEDDINGS_ENABLED:
+        return None
+    key = (region, model_stamp)
+    with _stores_lock:
+        if key not in _stores:
+            scope = "global" if region is None else f"regions/{region}"
+            directory = FIELD_EMBEDDINGS_DIR / scope / model_stamp
+            try:
+                _stores[key] = FieldEmbeddingStore(directory, dim=dim)
+            except (OSError, ValueError) as e:
+                print(f"Field embedding store unavailable at {directory}: {e}")
+                _stores[key] = None
+        return _stores[key]
@@ -0,0 +1,97 @@
+# src/field_state.py
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from config import (
+    CROP_FEATURES,
+    SUSTAINABILITY_FEATURES,
+    YIELD_FEATURES,
+    FIELD_STATE_MAX_FIELDS,
+    FIELD_STATE_DEFAULT_TOLERANCE,
+    FIELD_STATE_TOLERANCES,
+)
+
+FEATURES_BY_MODEL = {
+    "crop": CROP_FEATURES,
+    "sustainability": SUSTAINABILITY_FEATURES,
+    "yield": YIELD_FEATURES,
+}
+
+
+class FieldStateStore:
+    """
+    In-memory, bounded store of the last prediction made for each field.
+
+    For every (field_id, model_key) it keeps the normalized feature vector the
+    stored prediction was computed from. A new reading reuses that prediction
+    while every feature stays within its tolerance of the stored vector, so
+    slow drift still triggers a recompute once it adds up. Fields are evicted
+    least-recently-used once more than max_fields are tracked.
+    """
+
+    def __init__(self, max_fields: int, default_tolerance: float,
+                 tolerances: Dict[str, Dict[str, float]] | None = None):
+        self.max_fields = max_fields
+        self.default_tolerance = default_tolerance
+        self._tolerances = {
+            model_key: self._build_tolerance(features, (tolerances or {}).get(model_key, {}))
+            for model_key, features in FEATURES_BY_MODEL.items()
+        }
+        self._fields: "OrderedDict[str, Dict[str, tuple]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _build_tolerance(self, features, overrides: Dict[str, float]) -> np.ndarray:
+        unknown = set(overrides) - set(features)
+        if unknown:
+            raise ValueError(f"Unknown features in tolerance overrides: {sorted(unknown)}")
+        return np.array(
+            [overrides.get(name, self.default_tolerance) for name in features],
+            dtype=np.float64,
+        )
+
+    def within_tolerance(self, model_key: str, features: np.ndarray, stored_features: np.ndarray) -> bool:
+        """True when every feature is within its tolerance of stored_features."""
+        return bool(np.all(np.abs(features - stored_features) <= self._tolerances[model_key]))
+
+    def get(self, field_id: str, model_key: str, features: np.ndarray) -> Optional[Any]:
+        """Return the stored prediction if features are within tolerance, else None."""
+        with self._lock:
+            state = self._fields.get(field_id)
+            if state is not None:
+                self._fields.move_to_end(field_id)
+                entry = state.get(model_key)
+                if entry is not None:
+                    stored_features, prediction = entry
+                    if self.within_tolerance(model_key, features, stored_features):
+                        self.hits += 1
+                        return prediction
+            self.misses += 1
+            return None
+
+    def put(self, field_id: str, model_key: str, features: np.ndarray, prediction: Any) -> None:
+        """Record a freshly computed prediction for the field."""
+        with self._lock:
+            state = self._fields.get(field_id)
+            if state is None:
+                state = self._fields[field_id] = {}
+            else:
+                self._fields.move_to_end(field_id)
+            state[model_key] = (np.array(features, dtype=np.float64, copy=True), prediction)
+            while len(self._fields) > self.max_fields:
+                self._fields.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"fields": len(self._fields), "hits": self.hits, "misses": self.misses}
+
+
+field_state_store = FieldStateStore(
+    max_fields=FIELD_STATE_MAX_FIELDS,
+    default_tolerance=FIELD_STATE_DEFAULT_TOLERANCE,
+    tolerances=FIELD_STATE_TOLERANCES,
+)
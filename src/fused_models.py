@@ -0,0 +1,124 @@
+# src/fused_models.py
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from typing import Dict, List, Sequence
+
+from src.data_preprocessing import DataPreprocessor
+
+# Raw (un-normalized) input layout shared by the fused models: the numeric
+# fields followed by the 7-way crop one-hot. Every model's normalized input is
+# an affine function of this vector, so preprocessing folds into layer 1.
+COMBINED_RAW_NUMERIC = [
+    "temperature_c", "humidity_pct", "soil_ph", "rainfall_mm",
+    "soil_moisture_pct", "fertilizer_usage_kg", "pesticide_usage_kg",
+]
+
+
+def _linear_chain(model: nn.Module) -> List[nn.Linear]:
+    """Return fc1, fc2, ... of a Linear→ReLU→...→Linear model."""
+    layers = []
+    while isinstance(getattr(model, f"fc{len(layers) + 1}", None), nn.Linear):
+        layers.append(getattr(model, f"fc{len(layers) + 1}"))
+    if not layers:
+        raise ValueError(f"{type(model).__name__} has no fc1..fcN linear chain")
+    return layers
+
+
+def _input_projection(model_key: str, raw_numeric: Sequence[str]) -> np.ndarray:
+    """
+    Recover the affine map raw -> normalized input used by DataPreprocessor.
+
+    The crop one-hot always sums to one, so the constant term is folded into
+    the crop columns and the map becomes purely linear: (F_model, R).
+    """
+    zeros = {name: 0.0 for name in raw_numeric}
+    crop_types = DataPreprocessor.CROP_TYPES
+
+    crop_columns = [
+        DataPreprocessor.normalize_for(model_key, dict(zeros, crop_type=crop_type))
+        for crop_type in crop_types
+    ]
+    base = crop_columns[crop_types.index("other")]
+    numeric_columns = []
+    for name in raw_numeric:
+        probe = dict(zeros, crop_type="other")
+        probe[name] = 1.0
+        numeric_columns.append(DataPreprocessor.normalize_for(model_key, probe) - base)
+
+    return np.stack(numeric_columns + crop_columns, axis=1).astype(np.float64)
+
+
+class FusedPredictor(nn.Module):
+    """
+    Horizontally fused execution of several Linear/ReLU regression models.
+
+    Layer 1 of every model (with its input normalization folded in) is stacked
+    into one wide matrix over the shared raw input; each later layer becomes a
+    single block-diagonal matmul. One chain of len(fc) matmuls therefore
+    produces all model outputs for a batch, one column per model.
+    """
+
+    def __init__(self, models: Dict[str, nn.Module], raw_numeric: Sequence[str] = COMBINED_RAW_NUMERIC):
+        super(FusedPredictor, self).__init__()
+        self.model_keys = list(models)
+        self.raw_numeric = list(raw_numeric)
+
+        chains = {key: _linear_chain(model) for key, model in models.items()}
+        depths = {len(chain) for chain in chains.values()}
+        if len(depths) != 1:
+            raise ValueError(f"Models must have the same depth to be fused, got {depths}")
+
+        weights, biases = [], []
+        for depth in range(depths.pop()):
+            layer_w, layer_b = [], []
+            for key in self.model_keys:
+                linear = chains[key][depth]
+                w = linear.weight.detach().cpu().double().numpy()
+                b = linear.bias.detach().cpu().double().numpy()
+                if depth == 0:
+                    w = w @ _input_projection(key, self.raw_numeric)
+                layer_w.append(w)
+                layer_b.append(b)
+            if depth == 0:
+                fused_w = np.concatenate(layer_w, axis=0)
+            else:
+                fused_w = torch.block_diag(*[torch.from_numpy(w) for w in layer_w]).numpy()
+            weights.append(torch.from_numpy(fused_w).float())
+            biases.append(torch.from_numpy(np.concatenate(layer_b)).float())
+
+        for i, (w, b) in enumerate(zip(weights, biases)):
+            self.register_buffer(f"w{i}", w)
+            self.register_buffer(f"b{i}", b)
+        self.depth = len(weights)
+        self.to(next(iter(models.values())).fc1.weight.device)
+
+    def forward(self, raw):
+        h = raw
+        for i in range(self.depth):
+            h = F.linear(h, getattr(self, f"w{i}"), getattr(self, f"b{i}"))
+            if i < self.depth - 1:
+                h = F.relu(h)
+        return h  # (B, len(model_keys))
+
+    def raw_batch(self, records: List[dict]) -> np.ndarray:
+        """Build the (B, R) raw input matrix for a list of request dicts."""
+        crop_types = DataPreprocessor.CROP_TYPES
+        numeric = np.array(
+            [[record[name] for name in self.raw_numeric] for record in records],
+            dtype=np.float32,
+        ).reshape(len(records), len(self.raw_numeric))
+        onehot = np.zeros((len(records), len(crop_types)), dtype=np.float32)
+        for row, record in enumerate(records):
+            crop_type = str(record.get("crop_type", "other")).lower()
+            idx = crop_types.index(crop_type) if crop_type in crop_types else crop_types.index("other")
+            onehot[row, idx] = 1.0
+        return np.concatenate([numeric, onehot], axis=1)
+
+    def predict(self, records: List[dict]) -> Dict[str, np.ndarray]:
+        device = self.w0.device
+        with torch.no_grad():
+            x = torch.from_numpy(self.raw_batch(records)).to(device)
+            outputs = self.forward(x).cpu().numpy()
+        return {key: outputs[:, i] for i, key in enumerate(self.model_keys)}
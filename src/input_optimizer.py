@@ -0,0 +1,146 @@
+# src/input_optimizer.py
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+
+from config import (
+    SUSTAINABILITY_FEATURES,
+    YIELD_FEATURES,
+    OPTIMIZER_STARTS,
+    OPTIMIZER_STEPS,
+    OPTIMIZER_LR,
+)
+from src.data_preprocessing import DataPreprocessor
+
+CONTROLS = ("fertilizer_usage_kg", "pesticide_usage_kg")
+_PENALTY = 10.0
+
+
+def _pareto_mask(cost: np.ndarray, benefit: np.ndarray) -> np.ndarray:
+    """True for points no other point beats on both cost (lower) and benefit (higher)."""
+    dominated = (
+        (cost[None, :] <= cost[:, None]) & (benefit[None, :] >= benefit[:, None])
+        & ((cost[None, :] < cost[:, None]) | (benefit[None, :] > benefit[:, None]))
+    ).any(axis=1)
+    return ~dominated
+
+
+class InputOptimizer:
+    """
+    Batched search over the controllable inputs (fertilizer, pesticide).
+
+    Every start point carries its own scalarization weight between input cost
+    and the benefit (yield, or sustainability), plus a penalty for missing the
+    yield threshold, so one population covers the whole trade-off curve. Each
+    iteration is a single batched forward/backward through YieldPredictor and
+    SustainabilityPredictor. Controls are optimized in logit space, so every
+    candidate stays inside its bounds.
+    """
+
+    def __init__(self, yield_model, sustainability_model):
+        self.yield_model = yield_model
+        self.sustainability_model = sustainability_model
+        self.device = next(yield_model.parameters()).device
+
+    def _base_rows(self, base: dict) -> Dict[str, torch.Tensor]:
+        """Normalized inputs for the fixed (non-control) fields, built once per query."""
+        return {
+            model_key: torch.as_tensor(
+                DataPreprocessor.normalize_for(model_key, base), dtype=torch.float32, device=self.device
+            )
+            for model_key in ("yield", "sustainability")
+        }
+
+    @staticmethod
+    def _with_controls(base_row: torch.Tensor, features: List[str], mean: np.ndarray,
+                       std: np.ndarray, controls: torch.Tensor) -> torch.Tensor:
+        x = base_row.expand(controls.shape[0], -1).clone()
+        for j, name in enumerate(CONTROLS):
+            i = features.index(name)
+            x[:, i] = (controls[:, j] - float(mean[i])) / float(std[i])
+        return x
+
+    def _evaluate(self, base_rows: Dict[str, torch.Tensor],
+                  controls: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        y_in = self._with_controls(base_rows["yield"], YIELD_FEATURES,
+                                   DataPreprocessor.YIELD_MEAN, DataPreprocessor.YIELD_STD, controls)
+        s_in = self._with_controls(base_rows["sustainability"], SUSTAINABILITY_FEATURES,
+                                   DataPreprocessor.SUSTAINABILITY_MEAN, DataPreprocessor.SUSTAINABILITY_STD,
+                                   controls)
+        return self.yield_model(y_in)[:, 0], self.sustainability_model(s_in)[:, 0]
+
+    def optimize(self, base: dict, objective: str, bounds: Dict[str, Tuple[float, float]],
+                 yield_threshold: Optional[float] = None, n_starts: int = OPTIMIZER_STARTS,
+                 steps: int = OPTIMIZER_STEPS, lr: float = OPTIMIZER_LR, seed: int = 0) -> Dict:
+        """
+        objective="min_inputs": least fertilizer+pesticide reaching yield_threshold.
+        objective="max_sustainability": best sustainability with yield >= yield_threshold.
+        """
+        if objective not in ("min_inputs", "max_sustainability"):
+            raise ValueError(f"Unknown objective: {objective}")
+        start_time = time.perf_counter()
+
+        lo = torch.tensor([bounds[name][0] for name in CONTROLS], device=self.device)
+        hi = torch.tensor([bounds[name][1] for name in CONTROLS], device=self.device)
+        generator = torch.Generator().manual_seed(seed)
+        u0 = torch.rand(n_starts, len(CONTROLS), generator=generator).clamp(0.02, 0.98).to(self.device)
+        logits = torch.logit(u0).requires_grad_(True)
+        weights = torch.linspace(0.05, 0.95, n_starts, device=self.device)
+        base_rows = self._base_rows(base)
+
+        with torch.no_grad():
+            y0, s0 = self._evaluate(base_rows, lo + u0 * (hi - lo))
+            benefit0 = y0 if objective == "min_inputs" else s0
+            benefit_scale = benefit0.std().clamp_min(1e-6)
+            threshold_scale = max(abs(yield_threshold), 1e-6) if yield_threshold is not None else 1.0
+
+        optimizer = torch.optim.Adam([logits], lr=lr)
+        with torch.enable_grad():
+            for _ in range(steps):
+                controls = lo + torch.sigmoid(logits) * (hi - lo)
+                y, s = self._evaluate(base_rows, controls)
+                benefit = y if objective == "min_inputs" else s
+                # Total kg of inputs, scaled to ~[0, 1] for conditioning
+                cost = controls.sum(dim=1) / hi.sum().clamp_min(1e-6)
+                loss = weights * cost - (1 - weights) * benefit / benefit_scale
+                if yield_threshold is not None:
+                    loss = loss + _PENALTY * torch.relu(yield_threshold - y) / threshold_scale
+                # autograd.grad, not backward(): never touch the serving models' .grad
+                (logits.grad,) = torch.autograd.grad(loss.sum(), logits)
+                optimizer.step()
+
+        with torch.no_grad():
+            controls = torch.cat([lo + u0 * (hi - lo), lo + torch.sigmoid(logits) * (hi - lo)])
+            y, s = self._evaluate(base_rows, controls)
+        controls, y, s = controls.cpu().numpy(), y.cpu().numpy(), s.cpu().numpy()
+
+        feasible = np.ones(len(y), dtype=bool) if yield_threshold is None else y >= yield_threshold
+        cost = controls.sum(axis=1)
+        benefit = y if objective == "min_inputs" else s
+        candidates = np.flatnonzero(feasible) if feasible.any() else np.arange(len(y))
+        front = candidates[_pareto_mask(cost[candidates], benefit[candidates])]
+        front = front[np.argsort(cost[front])]
+
+        if feasible.any():
+            best = front[0] if objective == "min_inputs" else front[np.argmax(benefit[front])]
+        else:
+            best = int(np.argmax(y))  # closest we can get to the threshold
+
+        def point(i):
+            return {
+                "fertilizer_usage_kg": round(float(controls[i, 0]), 3),
+                "pesticide_usage_kg": round(float(controls[i, 1]), 3),
+                "predicted_yield_kg_per_hectare": round(float(y[i]), 2),
+                "sustainability_score": round(float(s[i]), 4),
+            }
+
+        return {
+            "objective": objective,
+            "feasible": bool(feasible.any()),
+            "best": point(best),
+            "pareto_front": [point(i) for i in front],
+            "evaluations": int(n_starts * (steps + 1) + len(y)),
+            "elapsed_ms": round((time.perf_counter() - start_time) * 1e3, 1),
+        }
@@ -0,0 +1,256 @@
+# src/model_bundle.py
+"""
+Single-file model bundle: every model's weights, normalization stats and
+feature order plus the crop embedding matrix.
+
+Layout (little-endian):
+    header   8s magic "AGRIBNDL", u32 format version, u32 TOC length
+    TOC      UTF-8 JSON: bundle version, per-model class/kwargs/feature order
+             and section offsets, crop embedding names and section
+    data     float32 sections, each starting on a 64-byte boundary
+
+Sections are addressed relative to the first 64-byte boundary after the TOC.
+The file is mapped copy-on-write, so tensors are views into the page cache,
+shared by every worker that maps the same file; writes would stay private.
+
+    python -m src.model_bundle convert [--output PATH] [--region NAME] [--version V]
+    python -m src.model_bundle inspect [PATH]
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import torch
+
+BUNDLE_MAGIC = b"AGRIBNDL"
+BUNDLE_FORMAT_VERSION = 1
+_HEADER = struct.Struct("<8sII")
+_ALIGN = 64
+
+
+def _align(offset: int) -> int:
+    return -(-offset // _ALIGN) * _ALIGN
+
+
+class ModelBundle:
+    """Read-only view of a bundle file, memory-mapped with ACCESS_COPY."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        try:
+            magic, version, toc_length = _HEADER.unpack_from(self._mmap, 0)
+        except struct.error as e:
+            raise ValueError(f"{self.path} is truncated: {e}") from e
+        if magic != BUNDLE_MAGIC:
+            raise ValueError(f"{self.path} is not a model bundle")
+        if version != BUNDLE_FORMAT_VERSION:
+            raise ValueError(f"{self.path} has bundle format {version}, expected {BUNDLE_FORMAT_VERSION}")
+        self.toc = json.loads(self._mmap[_HEADER.size:_HEADER.size + toc_length])
+        self._data_start = _align(_HEADER.size + toc_length)
+
+    def validate(self, model_keys) -> None:
+        """
+        Check the whole TOC before anything is built from it: every model in
+        model_keys is listed with kwargs, a feature order, mean/std of that
+        length and tensor sections, and every section lies inside the file.
+        Raises ValueError on any problem.
+        """
+        try:
+            if not isinstance(self.toc["version"], str):
+                raise ValueError("bundle version is not a string")
+            sections = []
+            for key in model_keys:
+                entry = self.toc["models"][key]
+                if not isinstance(entry["kwargs"], dict):
+                    raise ValueError(f"{key} kwargs are not an object")
+                n_features = len(entry["features"])
+                for stat in ("mean", "std"):
+                    if list(entry[stat]["shape"]) != [n_features]:
+                        raise ValueError(f"{key} {stat} does not match its {n_features} features")
+                if not entry["tensors"]:
+                    raise ValueError(f"{key} has no tensors")
+                sections += [entry["mean"], entry["std"], *entry["tensors"].values()]
+            if "crop_embeddings" in self.toc:
+                entry = self.toc["crop_embeddings"]
+                if list(entry["matrix"]["shape"][:1]) != [len(entry["names"])]:
+                    raise ValueError("crop embedding names do not match the matrix")
+                sections.append(entry["matrix"])
+            for section in sections:
+                end = self._data_start + int(section["offset"]) + 4 * int(np.prod(section["shape"]))
+                if section["offset"] < 0 or end > len(self._mmap):
+                    raise ValueError(f"section at offset {section['offset']} runs past the end of the file")
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"{self.path} has a malformed table of contents: {e!r}") from e
+        except ValueError as e:
+            raise ValueError(f"{self.path}: {e}") from e
+
+    @property
+    def version(self) -> str:
+        return self.toc["version"]
+
+    @property
+    def model_keys(self) -> List[str]:
+        return list(self.toc["models"])
+
+    def array(self, section: Dict) -> np.ndarray:
+        """Zero-copy float32 view of one section."""
+        shape = tuple(section["shape"])
+        return np.frombuffer(
+            self._mmap, dtype=np.float32, count=int(np.prod(shape)),
+            offset=self._data_start + section["offset"],
+        ).reshape(shape)
+
+    def model_kwargs(self, model_key: str) -> Dict:
+        return dict(self.toc["models"][model_key]["kwargs"])
+
+    def state_dict(self, model_key: str) -> Dict[str, torch.Tensor]:
+        tensors = self.toc["models"][model_key]["tensors"]
+        return {name: torch.from_numpy(self.array(section)) for name, section in tensors.items()}
+
+    def preprocessing_stats(self) -> Dict:
+        """model_key -> (feature order, mean, std)"""
+        return {
+            key: (entry["features"], self.array(entry["mean"]), self.array(entry["std"]))
+            for key, entry in self.toc["models"].items()
+        }
+
+    def crop_embeddings(self) -> Optional[Dict[str, np.ndarray]]:
+        entry = self.toc.get("crop_embeddings")
+        if entry is None:
+            return None
+        matrix = self.array(entry["matrix"])
+        return {name: matrix[i] for i, name in enumerate(entry["names"])}
+
+
+def write_bundle(path: Path, models: Dict[str, Dict], crop_embeddings: Optional[Dict[str, np.ndarray]],
+                 version: str) -> Path:
+    """
+    models: model_key -> {"class", "kwargs", "state_dict", "features", "mean", "std"}.
+    Written to a temp file and renamed, so workers mapping the old bundle keep
+    a consistent view.
+    """
+    sections = []
+    offset = 0
+
+    def add(array) -> Dict:
+        nonlocal offset
+        array = np.ascontiguousarray(np.asarray(array, dtype=np.float32))
+        entry = {"offset": offset, "shape": list(array.shape)}
+        sections.append((offset, array))
+        offset = _align(offset + array.nbytes)
+        return entry
+
+    toc = {"version": version, "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "models": {}}
+    for key, spec in models.items():
+        toc["models"][key] = {
+            "class": spec["class"],
+            "kwargs": spec["kwargs"],
+            "features": list(spec["features"]),
+            "mean": add(spec["mean"]),
+            "std": add(spec["std"]),
+            "tensors": {
+                name: add(tensor.detach().cpu().numpy()) for name, tensor in spec["state_dict"].items()
+            },
+        }
+    if crop_embeddings:
+        names = list(crop_embeddings)
+        toc["crop_embeddings"] = {
+            "names": names,
+            "matrix": add(np.stack([crop_embeddings[name] for name in names])),
+        }
+
+    toc_bytes = json.dumps(toc).encode()
+    data_start = _align(_HEADER.size + len(toc_bytes))
+    path = Path(path)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(BUNDLE_MAGIC, BUNDLE_FORMAT_VERSION, len(toc_bytes)))
+        f.write(toc_bytes)
+        for section_offset, array in sections:
+            f.seek(data_start + section_offset)
+            f.write(array.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp, path)
+    return path
+
+
+# ------------------------------------------------------------------ converter
+def convert(model_paths: Dict[str, Path], output: Path, crop_embeddings: Optional[Dict[str, np.ndarray]],
+            version: Optional[str] = None) -> Path:
+    """Build a bundle from .pt checkpoints, DataPreprocessor stats and crop embeddings."""
+    from src.data_preprocessing import DataPreprocessor
+    from src.model_loader import ModelLoader
+
+    stats = DataPreprocessor.current_stats()
+    models = {}
+    for key, (model_class, _) in ModelLoader.MODEL_CLASSES.items():
+        checkpoint = torch.load(model_paths[key], map_location="cpu", weights_only=False)
+        state_dict = checkpoint["model_state_dict"]
+        kwargs = {"input_size": int(state_dict["fc1.weight"].shape[1])}
+        if key == "crop":
+            kwargs["embedding_size"] = int(checkpoint.get("embedding_size", 64))
+        features, mean, std = stats[key]
+        if kwargs["input_size"] != len(features):
+            raise ValueError(f"{key} checkpoint expects {kwargs['input_size']} inputs, config lists {len(features)}")
+        models[key] = {
+            "class": model_class.__name__, "kwargs": kwargs, "state_dict": state_dict,
+            "features": features, "mean": mean, "std": std,
+        }
+    if version is None:
+        version = time.strftime("%Y%m%d%H%M%S", time.localtime(max(os.path.getmtime(p) for p in model_paths.values())))
+    return write_bundle(output, models, crop_embeddings, version)
+
+
+def main():
+    from config import MODEL_BUNDLE_PATH, MODEL_PATHS, REGION_MODEL_DIR
+
+    parser = argparse.ArgumentParser(description="Build or inspect a model bundle")
+    sub = parser.add_subparsers(dest="command", required=True)
+    convert_parser = sub.add_parser("convert", help="convert the .pt checkpoints into a bundle")
+    convert_parser.add_argument("--output", type=Path, default=None)
+    convert_parser.add_argument("--region", default=None, help="convert REGION_MODEL_DIR/<region> instead")
+    convert_parser.add_argument("--version", default=None, help="defaults to the newest checkpoint mtime")
+    inspect_parser = sub.add_parser("inspect", help="print a bundle's table of contents")
+    inspect_parser.add_argument("path", type=Path, nargs="?", default=MODEL_BUNDLE_PATH)
+    args = parser.parse_args()
+
+    if args.command == "inspect":
+        bundle = ModelBundle(args.path)
+        print(f"{args.path}: version {bundle.version}, {os.path.getsize(args.path)} bytes")
+        for key, entry in bundle.toc["models"].items():
+            n_params = sum(int(np.prod(s["shape"])) for s in entry["tensors"].values())
+            print(f"  {key:15s} {entry['class']} {entry['kwargs']} {n_params} params, {len(entry['features'])} features")
+        if "crop_embeddings" in bundle.toc:
+            print(f"  crop_embeddings {bundle.toc['crop_embeddings']['matrix']['shape']}")
+        return
+
+    if args.region is None:
+        from config import CROP_EMBEDDINGS
+        model_paths, embeddings = MODEL_PATHS, CROP_EMBEDDINGS
+        output = args.output or MODEL_BUNDLE_PATH
+    else:
+        # Region sets must share the global normalization stats
+        if MODEL_BUNDLE_PATH.exists():
+            from src.data_preprocessing import DataPreprocessor
+            DataPreprocessor.load_stats(ModelBundle(MODEL_BUNDLE_PATH).preprocessing_stats())
+        region_dir = REGION_MODEL_DIR / args.region
+        model_paths = {key: region_dir / path.name for key, path in MODEL_PATHS.items()}
+        embeddings = None
+        if (region_dir / "crop_embeddings.npz").exists():
+            with np.load(region_dir / "crop_embeddings.npz") as table:
+                embeddings = {name: table[name] for name in table.files}
+        output = args.output or region_dir / MODEL_BUNDLE_PATH.name
+    path = convert(model_paths, output, embeddings, args.version)
+    print(f"Wrote {path} ({os.path.getsize(path)} bytes, version {ModelBundle(path).version})")
+
+
+if __name__ == "__main__":
+    main()
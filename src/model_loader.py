@@ -1,10 +1,23 @@
 # src/model_loader.py
+import os
+import threading
 import torch
-from config import MODEL_PATHS
+import numpy as np
+from config import MODEL_PATHS, MODEL_BUNDLE_PATH, REGION_MODEL_DIR, TUNED_PROFILE_PATH
+from src.utils import get_device, load_json
+from src.data_preprocessing import DataPreprocessor
+from src.drift import drift_monitor
+from src.model_bundle import ModelBundle
+from src.shared_cache import artifact_stamp, model_namespace
 from src.model_definitions import CropRecommender, SustainabilityPredictor, YieldPredictor, CropEmbeddingModel
+from src.fused_models import FusedPredictor
 
 class ModelLoader:
     _models = {}
+    _fused = {}
+    _profile = None
+    _bundle = None
+    _lock = threading.Lock()  # startup warm-up and first requests may race
    
     @classmethod
     def get_model_input_size(cls, model_path):
@@ -24,91 +37,213 @@ class ModelLoader:
             return None
 
     @classmethod
-    def load_models(cls):
-        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-       
-        if not cls._models:
-            # Load crop model
-            try:
-                crop_checkpoint = torch.load(
-                    MODEL_PATHS["crop"],
-                    map_location=device,
-                    weights_only=False
-                )
-                
-                # Auto-detect input size from saved model
-                input_size = cls.get_model_input_size(MODEL_PATHS["crop"])
-                if input_size is None:
-                    raise ValueError("Could not determine input size for crop model")
-                
-                print(f"Crop model input size: {input_size}")
-                
-                embedding_size = crop_checkpoint.get('embedding_size', 64)
-                
-                crop_model = CropEmbeddingModel(input_size=input_size, embedding_size=embedding_size)
-                crop_model.load_state_dict(crop_checkpoint['model_state_dict'])
-                crop_model.eval()
-                crop_model.to(device)
-                
-                print("Crop model loaded successfully")
-                cls._models["crop"] = crop_model
-                
-            except Exception as e:
-                print(f"Error loading crop model: {e}")
-                cls._models["crop"] = None
-           
-            # Load sustainability model
+    def apply_tuned_profile(cls):
+        """Apply thread settings from the autotune profile, once per process"""
+        if cls._profile is not None:
+            return cls._profile
+
+        cls._profile = {}
+        if not TUNED_PROFILE_PATH.exists():
+            return cls._profile
+        try:
+            profile = load_json(TUNED_PROFILE_PATH)
+            tuned_cpus = profile.get("machine", {}).get("cpu_count")
+            if tuned_cpus != os.cpu_count():
+                print(f"Ignoring tuned profile for {tuned_cpus} CPUs on a {os.cpu_count()}-CPU machine; rerun python -m src.autotune")
+                return cls._profile
+
+            torch.set_num_threads(profile["num_threads"])
             try:
-                sust_checkpoint = torch.load(
-                    MODEL_PATHS["sustainability"],
-                    map_location=device,
-                    weights_only=False
-                )
-                
-                # Auto-detect input size from saved model
-                input_size = cls.get_model_input_size(MODEL_PATHS["sustainability"])
-                if input_size is None:
-                    raise ValueError("Could not determine input size for sustainability model")
-                
-                print(f"Sustainability model input size: {input_size}")
-                
-                sust_model = SustainabilityPredictor(input_size=input_size)
-                sust_model.load_state_dict(sust_checkpoint['model_state_dict'])
-                sust_model.eval()
-                sust_model.to(device)
-                
-                print("Sustainability model loaded successfully")
-                cls._models["sustainability"] = sust_model
-                
-            except Exception as e:
-                print(f"Error loading sustainability model: {e}")
-                cls._models["sustainability"] = None
-           
-            # Load yield model
+                torch.set_num_interop_threads(profile["num_interop_threads"])
+            except RuntimeError as e:
+                # Only settable before the first inter-op parallel work
+                print(f"Could not set inter-op threads: {e}")
+            cls._profile = profile
+            print(f"Applied tuned profile: threads={profile['num_threads']} interop={profile['num_interop_threads']}")
+        except Exception as e:
+            print(f"Error applying tuned profile {TUNED_PROFILE_PATH}: {e}")
+        return cls._profile
+
+    @classmethod
+    def micro_batch_size(cls, model_key, default=32):
+        """Tuned micro-batch size for model_key (or the fused 'combined' path)"""
+        return cls.apply_tuned_profile().get("micro_batch_size", {}).get(model_key, default)
+
+    # model_key -> (class, label used in log messages)
+    MODEL_CLASSES = {
+        "crop": (CropEmbeddingModel, "Crop"),
+        "sustainability": (SustainabilityPredictor, "Sustainability"),
+        "yield": (YieldPredictor, "Yield"),
+    }
+
+    @classmethod
+    def _load_model(cls, model_key, model_path, device):
+        """Load one checkpoint; returns None (and logs) on failure"""
+        model_class, label = cls.MODEL_CLASSES[model_key]
+        try:
+            checkpoint = torch.load(
+                model_path,
+                map_location=device,
+                weights_only=False
+            )
+
+            # Auto-detect input size from saved model
+            input_size = cls.get_model_input_size(model_path)
+            if input_size is None:
+                raise ValueError(f"Could not determine input size for {model_key} model")
+
+            print(f"{label} model input size: {input_size}")
+
+            kwargs = {"input_size": input_size}
+            if model_key == "crop":
+                kwargs["embedding_size"] = checkpoint.get('embedding_size', 64)
+
+            model = model_class(**kwargs)
+            model.load_state_dict(checkpoint['model_state_dict'])
+            model.eval()
+            model.to(device)
+
+            print(f"{label} model loaded successfully")
+            return model
+
+        except Exception as e:
+            print(f"Error loading {model_key} model: {e}")
+            return None
+
+    @classmethod
+    def load_model_set(cls, model_paths):
+        """Load crop, sustainability and yield models from the given paths"""
+        device = torch.device(get_device())
+        return {
+            model_key: cls._load_model(model_key, model_paths[model_key], device)
+            for model_key in cls.MODEL_CLASSES
+        }
+
+    @classmethod
+    def load_bundle_set(cls, bundle):
+        """
+        Build every model in a ModelBundle without copying its weights:
+        modules are created on the meta device and load_state_dict(assign=True)
+        makes the mmap-backed tensors their parameters.
+        """
+        device = torch.device(get_device())
+        models = {}
+        for model_key, (model_class, label) in cls.MODEL_CLASSES.items():
             try:
-                yield_checkpoint = torch.load(
-                    MODEL_PATHS["yield"],
-                    map_location=device,
-                    weights_only=False
-                )
-                
-                # Auto-detect input size from saved model
-                input_size = cls.get_model_input_size(MODEL_PATHS["yield"])
-                if input_size is None:
-                    raise ValueError("Could not determine input size for yield model")
-                
-                print(f"Yield model input size: {input_size}")
-                
-                yield_model = YieldPredictor(input_size=input_size)
-                yield_model.load_state_dict(yield_checkpoint['model_state_dict'])
-                yield_model.eval()
-                yield_model.to(device)
-                
-                print("Yield model loaded successfully")
-                cls._models["yield"] = yield_model
-                
+                with torch.device("meta"):
+                    model = model_class(**bundle.model_kwargs(model_key))
+                model.load_state_dict(bundle.state_dict(model_key), assign=True)
+                model.eval()
+                model.to(device)
+                print(f"{label} model loaded from bundle {bundle.version}")
+                models[model_key] = model
             except Exception as e:
-                print(f"Error loading yield model: {e}")
-                cls._models["yield"] = None
-       
-        return cls._models
\ No newline at end of file
+                print(f"Error loading {model_key} model from bundle {bundle.path}: {e}")
+                models[model_key] = None
+        embeddings = bundle.crop_embeddings()
+        if embeddings is not None:
+            models["crop_embeddings"] = embeddings
+        return models
+
+    @classmethod
+    def load_models(cls):
+        if cls._models:
+            return cls._models
+        with cls._lock:
+            if cls._models:
+                return cls._models
+            cls.apply_tuned_profile()
+            models, bundle, stats = {}, None, None
+            if MODEL_BUNDLE_PATH.exists():
+                # Validate the whole bundle before building anything from it
+                try:
+                    bundle = ModelBundle(MODEL_BUNDLE_PATH)
+                    bundle.validate(cls.MODEL_CLASSES)
+                    stats = bundle.preprocessing_stats()
+                    DataPreprocessor.validate_stats(stats)
+                    models = cls.load_bundle_set(bundle)
+                except Exception as e:
+                    print(f"Ignoring model bundle {MODEL_BUNDLE_PATH}: {e}")
+                    models, bundle = {}, None
+
+            # Any model the bundle could not provide comes from its checkpoint
+            from_bundle = [key for key in cls.MODEL_CLASSES if models.get(key) is not None]
+            device = torch.device(get_device())
+            for model_key in cls.MODEL_CLASSES:
+                if model_key not in from_bundle:
+                    if bundle is not None:
+                        print(f"Falling back to checkpoint for {model_key} model")
+                    models[model_key] = cls._load_model(model_key, MODEL_PATHS[model_key], device)
+            if "crop" not in from_bundle:
+                models.pop("crop_embeddings", None)  # they belong to the bundle's crop model
+            # Same role as a region set's cache_salt (see load_region_models)
+            models["cache_salt"] = model_namespace()
+
+            # Bundle stats only once every model is built, and only for the
+            # models that came from the bundle; checkpoints keep the built-in ones
+            if from_bundle:
+                DataPreprocessor.load_stats({key: stats[key] for key in from_bundle})
+                if drift_monitor is not None:
+                    drift_monitor.reset()
+                cls._bundle = bundle
+            cls._models.update(models)
+
+        return cls._models
+
+    @classmethod
+    def load_region_models(cls, region):
+        """
+        Load the model set for one region from REGION_MODEL_DIR/<region>/.
+
+        The directory holds either a model bundle (same file name as
+        MODEL_BUNDLE_PATH) or the same checkpoint file names as MODEL_DIR plus
+        an optional crop_embeddings.npz (one array per crop name); without
+        embeddings the global CROP_EMBEDDINGS are used.
+
+        Normalization stats are process-wide, so a region bundle whose stats
+        differ from the ones in use is rejected rather than served with the
+        wrong normalization (convert --region writes the global bundle's stats).
+        """
+        region_dir = REGION_MODEL_DIR / region
+        if not region_dir.is_dir():
+            raise FileNotFoundError(f"No model set for region '{region}'")
+
+        # The global stats must be settled first: the bundle check below and
+        # the fused predictor's folded-in normalization both read them
+        cls.load_models()
+        bundle_path = region_dir / MODEL_BUNDLE_PATH.name
+        if bundle_path.exists():
+            bundle = ModelBundle(bundle_path)
+            bundle.validate(cls.MODEL_CLASSES)
+            if not DataPreprocessor.matches_stats(bundle.preprocessing_stats()):
+                raise ValueError(f"Region '{region}' bundle has normalization stats that differ from the global ones")
+            models = cls.load_bundle_set(bundle)
+        else:
+            models = cls.load_model_set({key: region_dir / path.name for key, path in MODEL_PATHS.items()})
+        missing = [key for key in cls.MODEL_CLASSES if models.get(key) is None]
+        if missing:
+            raise ValueError(f"Region '{region}' is missing models: {missing}")
+        # Built here, once per load, so its buffers count towards the set's size
+        models["fused"] = FusedPredictor({key: models[key] for key in ("sustainability", "yield")})
+
+        embeddings_path = region_dir / "crop_embeddings.npz"
+        if "crop_embeddings" not in models and embeddings_path.exists():
+            with np.load(embeddings_path) as table:
+                models["crop_embeddings"] = {name: table[name] for name in table.files}
+        # Prediction caches and the field embedding store are keyed by this,
+        # so redeploying the region's artifacts stops old entries being used
+        models["cache_salt"] = artifact_stamp(sorted(p for p in region_dir.iterdir() if p.is_file()))
+        return models
+
+    @classmethod
+    def load_fused(cls, model_keys=("sustainability", "yield")):
+        """Return a FusedPredictor over model_keys, built once from the loaded models."""
+        key = tuple(model_keys)
+        if key not in cls._fused:
+            models = cls.load_models()
+            missing = [k for k in key if models.get(k) is None]
+            if missing:
+                raise ValueError(f"Cannot fuse, models not available: {missing}")
+            cls._fused[key] = FusedPredictor({k: models[k] for k in key})
+            print(f"Fused predictor built for: {', '.join(key)}")
+        return cls._fused[key]
\ No newline at end of file
@@ -13,9 +13,32 @@ def _as_device_batch(features: np.ndarray, model: torch.nn.Module) -> torch.Tens
     return to_tensor(features).unsqueeze(0).to(device)
 
 # ------------------------------------------------------------------ crop
-def predict_crop(model, input_data) -> str:
+def embed_crop(model, features: np.ndarray) -> np.ndarray:
+    """
+    Crop-model embedding of one normalized feature vector.
+    """
+    with torch.no_grad():
+        x = _as_device_batch(features, model)
+        return model(x).cpu().numpy().flatten()
+
+
+def nearest_crop(embedding: np.ndarray, crop_embeddings=None) -> str:
+    """
+    Crop whose reference embedding is closest to embedding.
+    """
+    best_crop, min_dist = None, float("inf")
+    for crop, ref in (crop_embeddings or CROP_EMBEDDINGS).items():
+        dist = np.linalg.norm(embedding - ref)
+        if dist < min_dist:
+            best_crop, min_dist = crop, dist
+    return best_crop if best_crop else "other"
+
+
+def predict_crop(model, input_data, crop_embeddings=None, features=None) -> str:
     """
     Return the crop whose reference embedding is closest to the sample embedding.
+    crop_embeddings overrides the global CROP_EMBEDDINGS (e.g. per region);
+    features, if the caller already normalized input_data, skips preprocessing.
     """
     try:
         # Debug: Print what we received
@@ -34,22 +57,14 @@ def predict_crop(model, input_data) -> str:
         if missing_fields:
             raise ValueError(f"Missing required fields: {missing_fields}")
         
-        features = DataPreprocessor.normalize_crop_input(input_data)
+        if features is None:
+            features = DataPreprocessor.normalize_crop_input(input_data)
         print(f"Normalized features shape: {features.shape}")
         
-        with torch.no_grad():
-            x = _as_device_batch(features, model)
-            embedding = model(x).cpu().numpy().flatten()
-        
+        embedding = embed_crop(model, features)
         print(f"Generated embedding shape: {embedding.shape}")
-        
-        best_crop, min_dist = None, float("inf")
-        for crop, ref in CROP_EMBEDDINGS.items():
-            dist = np.linalg.norm(embedding - ref)
-            if dist < min_dist:
-                best_crop, min_dist = crop, dist
-        
-        return best_crop if best_crop else "other"
+
+        return nearest_crop(embedding, crop_embeddings)
         
     except Exception as e:
         print(f"Error in predict_crop: {e}")
@@ -57,10 +72,34 @@ def predict_crop(model, input_data) -> str:
         print(f"Input data: {input_data}")
         raise e  # Re-raise to see full traceback
 
+def predict_crop_batch(model, records, crop_embeddings=None, micro_batch_size=None):
+    """
+    Recommended crop and embedding for every record, one forward pass per
+    micro-batch. Returns (list of crop names, (B, D) embeddings).
+    """
+    features = np.stack([DataPreprocessor.normalize_crop_input(record) for record in records])
+    step = micro_batch_size or len(records)
+    device = next(model.parameters()).device
+    with torch.no_grad():
+        embeddings = np.concatenate([
+            model(to_tensor(features[start:start + step]).to(device)).cpu().numpy()
+            for start in range(0, len(records), step)
+        ])
+
+    references = crop_embeddings or CROP_EMBEDDINGS
+    names = list(references)
+    reference = np.stack([references[name] for name in names]).astype(np.float32)
+    dists = (
+        (embeddings ** 2).sum(axis=1, keepdims=True)
+        - 2.0 * embeddings @ reference.T
+        + (reference ** 2).sum(axis=1)
+    )
+    return [names[i] for i in dists.argmin(axis=1)], embeddings
+
 # ------------------------------------------------------------------ sustainability
-def predict_sustainability(model, input_data) -> float:
+def predict_sustainability(model, input_data, features=None) -> float:
     """
-    Predict sustainability score.
+    Predict sustainability score (from features when already normalized).
     """
     try:
         # Debug: Print what we received
@@ -76,7 +115,8 @@ def predict_sustainability(model, input_data) -> float:
         if missing_fields:
             raise ValueError(f"Missing required fields: {missing_fields}")
         
-        features = DataPreprocessor.normalize_sustainability_input(input_data)
+        if features is None:
+            features = DataPreprocessor.normalize_sustainability_input(input_data)
         print(f"Normalized features shape: {features.shape}")
         
         with torch.no_grad():
@@ -92,9 +132,9 @@ def predict_sustainability(model, input_data) -> float:
         raise e  # Re-raise to see full traceback
 
 # ------------------------------------------------------------------ yield
-def predict_yield(model, input_data) -> float:
+def predict_yield(model, input_data, features=None) -> float:
     """
-    Predict crop yield.
+    Predict crop yield (from features when already normalized).
     """
     try:
         # Debug: Print what we received
@@ -111,7 +151,8 @@ def predict_yield(model, input_data) -> float:
         if missing_fields:
             raise ValueError(f"Missing required fields: {missing_fields}")
         
-        features = DataPreprocessor.normalize_yield_input(input_data)
+        if features is None:
+            features = DataPreprocessor.normalize_yield_input(input_data)
         print(f"Normalized features shape: {features.shape}")
         
         with torch.no_grad():
@@ -124,4 +165,25 @@ def predict_yield(model, input_data) -> float:
         print(f"Error in predict_yield: {e}")
         print(f"Input data type: {type(input_data)}")
         print(f"Input data: {input_data}")
-        raise e  # Re-raise to see full traceback
\ No newline at end of file
+        raise e  # Re-raise to see full traceback
+
+# ------------------------------------------------------------------ combined
+def predict_combined(fused_model, records, micro_batch_size=None) -> list:
+    """
+    Predict sustainability score and yield for a batch of records, one fused
+    forward pass per micro-batch.
+    """
+    step = micro_batch_size or len(records)
+    results = []
+    for start in range(0, len(records), step):
+        outputs = fused_model.predict(records[start:start + step])
+        sustainability = outputs["sustainability"]
+        yields = outputs["yield"]
+        results.extend(
+            {
+                "sustainability_score": round(float(sustainability[i]), 4),
+                "predicted_yield_kg_per_hectare": round(float(yields[i]), 2),
+            }
+            for i in range(len(sustainability))
+        )
+    return results
@@ -0,0 +1,171 @@
+# src/profiling.py
+import asyncio
+import fcntl
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Tuple
+
+# Stacks passing through any of these are the serving hot path
+HOT_PATH_MARKERS = ("_predict", "DataPreprocessor.", "predict_crop", "predict_sustainability",
+                    "predict_yield", "predict_combined", "InputOptimizer.")
+_LOCK_PATH = os.path.join(tempfile.gettempdir(), "agri-profile.lock")
+
+
+class ProfilerBusy(RuntimeError):
+    """Raised when a capture is requested while another one is running."""
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class StackSampler:
+    """
+    Low-overhead sampling profiler for the Python stacks of every thread.
+
+    A daemon thread snapshots sys._current_frames() every interval and counts
+    identical root→leaf stacks; nothing is hooked into the interpreter, so the
+    cost while idle is zero and while running is one snapshot per interval.
+    """
+
+    def __init__(self, interval_s: float = 0.005, hot_path_only: bool = True):
+        self.interval_s = interval_s
+        self.hot_path_only = hot_path_only
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval_s):
+            self.samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                stack.reverse()
+                if self.hot_path_only and not any(m in name for name in stack for m in HOT_PATH_MARKERS):
+                    continue
+                self.stacks[tuple(stack)] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        """Brendan Gregg collapsed-stack format, input for flamegraph.pl / speedscope."""
+        return "\n".join(f"{';'.join(stack)} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+    def speedscope(self, duration_s: float) -> str:
+        frames, index = [], {}
+        samples, weights = [], []
+        for stack, count in self.stacks.items():
+            sample = []
+            for name in stack:
+                if name not in index:
+                    index[name] = len(frames)
+                    frames.append({"name": name})
+                sample.append(index[name])
+            samples.append(sample)
+            weights.append(count * self.interval_s * 1e3)
+        return json.dumps({
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": "agri-api stack samples",
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": duration_s * 1e3,
+                "samples": samples,
+                "weights": weights,
+            }],
+        })
+
+
+class ProfileCapture:
+    """
+    Runs at most one on-demand capture per host: a process-local lock plus a
+    non-blocking fcntl lock on a file shared by every worker (fcntl locks do
+    not exclude threads of the same process).
+    """
+
+    _lock = threading.Lock()
+
+    @classmethod
+    async def capture(cls, mode: str, duration_s: float, output_format: str,
+                      interval_ms: float = 5.0, hot_path_only: bool = True) -> Tuple[bytes, str, str]:
+        """Return (content, media_type, filename) for a capture of duration_s."""
+        if not cls._lock.acquire(blocking=False):
+            raise ProfilerBusy("A profile capture is already running")
+        fd = os.open(_LOCK_PATH, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            try:
+                fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                raise ProfilerBusy("A profile capture is already running in another worker") from None
+            if mode == "torch":
+                return await cls._capture_torch(duration_s)
+            if mode == "sampling":
+                return await cls._capture_stacks(duration_s, output_format, interval_ms / 1e3, hot_path_only)
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        finally:
+            os.close(fd)  # releases the fcntl lock
+            cls._lock.release()
+
+    @staticmethod
+    async def _capture_torch(duration_s: float) -> Tuple[bytes, str, str]:
+        # torch.profiler only records ops on the thread that enters it, which
+        # is the event loop thread: the model calls made inline by the
+        # /predict/crop|sustainability|yield|combined handlers. Work in other
+        # threads (/predict/optimize-inputs in the threadpool, region-load,
+        # model warm-up, advisory runs) is not captured; use sampling mode,
+        # which walks every thread's stack, for those.
+        import torch.profiler
+
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(torch.profiler.ProfilerActivity.CUDA)
+        with torch.profiler.profile(activities=activities, record_shapes=True) as prof:
+            await asyncio.sleep(duration_s)
+
+        fd, path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        try:
+            prof.export_chrome_trace(path)
+            with open(path, "rb") as f:
+                content = f.read()
+        finally:
+            os.remove(path)
+        return content, "application/json", f"torch-trace-{int(time.time())}.json"
+
+    @staticmethod
+    async def _capture_stacks(duration_s: float, output_format: str, interval_s: float,
+                              hot_path_only: bool) -> Tuple[bytes, str, str]:
+        if output_format not in ("collapsed", "speedscope"):
+            raise ValueError(f"Unknown sampling output format: {output_format}")
+        sampler = StackSampler(interval_s=interval_s, hot_path_only=hot_path_only)
+        sampler.start()
+        try:
+            await asyncio.sleep(duration_s)
+        finally:
+            await asyncio.to_thread(sampler.stop)
+
+        stamp = int(time.time())
+        if output_format == "speedscope":
+            return sampler.speedscope(duration_s).encode(), "application/json", f"stacks-{stamp}.speedscope.json"
+        return sampler.collapsed().encode(), "text/plain", f"stacks-{stamp}.collapsed.txt"
@@ -0,0 +1,215 @@
+# src/region_models.py
+import asyncio
+import re
+import statistics
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from config import (
+    REGION_CACHE_MAX_BYTES,
+    REGION_LOAD_WORKERS,
+    REGION_PREFETCH_TOP_K,
+    REGION_PREFETCH_INTERVAL_S,
+    REGION_FAILURE_TTL_S,
+)
+from src.utils import LazyImport
+
+ModelLoader = LazyImport("src.model_loader", "ModelLoader")
+
+_REGION_NAME = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def model_set_nbytes(models: Dict) -> int:
+    """Bytes held by a model set's parameters, buffers and embedding table."""
+    import torch
+
+    total = 0
+    for value in models.values():
+        if isinstance(value, torch.nn.Module):
+            total += sum(t.numel() * t.element_size() for t in value.state_dict().values())
+        elif isinstance(value, dict):
+            total += sum(np.asarray(v).nbytes for v in value.values())
+    return total
+
+
+class RegionModelCache:
+    """
+    Memory-bounded LRU of per-region model sets.
+
+    Misses load in a background thread pool with single-flight: concurrent
+    requests for the same cold region share one load. Once a load finishes,
+    least-recently-used sets are evicted until the resident bytes fit
+    max_bytes (the set just loaded is always kept). Requests are counted per
+    hour of day, and a prefetch thread warms the regions that were busiest in
+    the coming hour. A failed load is remembered for failure_ttl_s, so
+    requests for a broken region fail fast instead of reloading it each time.
+    """
+
+    def __init__(self, loader: Optional[Callable[[str], Dict]] = None,
+                 max_bytes: int = REGION_CACHE_MAX_BYTES, load_workers: int = REGION_LOAD_WORKERS,
+                 failure_ttl_s: float = REGION_FAILURE_TTL_S):
+        self.loader = loader or (lambda region: ModelLoader.load_region_models(region))
+        self.max_bytes = max_bytes
+        self._resident: "OrderedDict[str, Dict]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._inflight: Dict[str, Future] = {}
+        self.failure_ttl_s = failure_ttl_s
+        self._failed: Dict[str, tuple] = {}  # region -> (retry after, exception)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=load_workers, thread_name_prefix="region-load")
+        self._hourly = [Counter() for _ in range(24)]
+        self._miss_load_s = []
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._prefetcher = None
+
+    @staticmethod
+    def validate(region: str) -> str:
+        if not _REGION_NAME.match(region):
+            raise ValueError(f"Invalid region name: {region!r}")
+        return region
+
+    def ensure(self, region: str, prefetch: bool = False) -> Future:
+        """Future for the region's model set, starting a load if needed."""
+        self.validate(region)
+        with self._lock:
+            if not prefetch:
+                self._hourly[datetime.now().hour][region] += 1
+            if region in self._resident:
+                self._resident.move_to_end(region)
+                if not prefetch:
+                    self.hits += 1
+                done = Future()
+                done.set_result(self._resident[region])
+                return done
+            if not prefetch:
+                self.misses += 1
+            failed = self._failed.get(region)
+            if failed is not None:
+                if time.monotonic() < failed[0]:
+                    done = Future()
+                    done.set_exception(failed[1])
+                    return done
+                del self._failed[region]
+            future = self._inflight.get(region)
+            if future is None:
+                future = self._executor.submit(self._load, region)
+                self._inflight[region] = future
+            return future
+
+    def borrow(self, region: str) -> Dict:
+        """
+        Model set for batch jobs. Uses a resident or in-flight set without
+        counting a hit or reordering the LRU, and otherwise loads a private
+        copy that is not cached, so batch-only regions never evict sets that
+        are hot for serving.
+        """
+        self.validate(region)
+        with self._lock:
+            models = self._resident.get(region)
+            future = self._inflight.get(region)
+        if models is not None:
+            return models
+        if future is not None:
+            return future.result()
+        return self.loader(region)
+
+    async def get(self, region: str) -> Dict:
+        """Resident model set for region, awaiting a background load on a miss."""
+        return await asyncio.wrap_future(self.ensure(region))
+
+    def _load(self, region: str) -> Dict:
+        start = time.perf_counter()
+        try:
+            models = self.loader(region)
+            nbytes = model_set_nbytes(models)
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._resident[region] = models
+                self._sizes[region] = nbytes
+                self._miss_load_s.append(elapsed)
+                del self._miss_load_s[:-1000]
+                self._evict_locked(keep=region)
+            print(f"Loaded model set for region {region} ({nbytes / 1e6:.1f} MB) in {elapsed * 1e3:.0f} ms")
+            return models
+        except Exception as e:
+            with self._lock:
+                self._failed[region] = (time.monotonic() + self.failure_ttl_s, e)
+            print(f"Failed to load model set for region {region}: {e}")
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(region, None)
+
+    def _evict_locked(self, keep: str) -> None:
+        while sum(self._sizes.values()) > self.max_bytes and len(self._resident) > 1:
+            region = next(iter(self._resident))
+            if region == keep:
+                self._resident.move_to_end(region)
+                continue
+            self._resident.pop(region)
+            self._sizes.pop(region)
+            self.evictions += 1
+            print(f"Evicted model set for region {region}")
+
+    # ------------------------------------------------------------------ prefetch
+    def hot_regions(self, hour: int, top_k: int = REGION_PREFETCH_TOP_K):
+        with self._lock:
+            return [region for region, _ in self._hourly[hour % 24].most_common(top_k)]
+
+    def prefetch(self) -> None:
+        """Warm the regions that are usually busiest now and in the next hour."""
+        hour = datetime.now().hour
+        for region in dict.fromkeys(self.hot_regions(hour) + self.hot_regions(hour + 1)):
+            self.ensure(region, prefetch=True)
+
+    def start_prefetcher(self, interval_s: float = REGION_PREFETCH_INTERVAL_S) -> None:
+        if self._prefetcher is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(interval_s)
+                try:
+                    self.prefetch()
+                except Exception as e:
+                    print(f"Region prefetch failed: {e}")
+
+        self._prefetcher = threading.Thread(target=run, name="region-prefetch", daemon=True)
+        self._prefetcher.start()
+
+    # ------------------------------------------------------------------ stats
+    def stats(self) -> Dict:
+        with self._lock:
+            loads = sorted(self._miss_load_s)
+            return {
+                "resident": [
+                    {"region": region, "bytes": self._sizes[region]} for region in self._resident
+                ],
+                "resident_bytes": sum(self._sizes.values()),
+                "max_bytes": self.max_bytes,
+                "loading": sorted(self._inflight),
+                "failed": sorted(r for r, (until, _) in self._failed.items() if until > time.monotonic()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "miss_load_ms": {
+                    "count": len(loads),
+                    "p50": round(statistics.median(loads) * 1e3, 1) if loads else None,
+                    "p95": round(loads[int(0.95 * (len(loads) - 1))] * 1e3, 1) if loads else None,
+                    "max": round(loads[-1] * 1e3, 1) if loads else None,
+                },
+                "hot_next_hour": [
+                    region for region, _ in self._hourly[(datetime.now().hour + 1) % 24].most_common(REGION_PREFETCH_TOP_K)
+                ],
+            }
+
+
+region_model_cache = RegionModelCache()
@@ -0,0 +1,251 @@
+# src/shared_cache.py
+import fcntl
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Optional
+
+import numpy as np
+
+from config import (
+    MODEL_BUNDLE_PATH,
+    MODEL_PATHS,
+    SHARED_CACHE_ENABLED,
+    SHARED_CACHE_NAME,
+    SHARED_CACHE_SLOTS,
+    SHARED_CACHE_WAYS,
+    SHARED_CACHE_LOCK_STRIPES,
+    SHARED_CACHE_QUANTUM,
+    SHARED_CACHE_RETRY_S,
+    SHARED_CACHE_RETRY_MAX_S,
+)
+
+_MAGIC = 0x4147524943414348  # "AGRICACH"
+_LAYOUT_VERSION = 1
+_HEADER_WORDS = 4            # magic, layout version, n_slots, ways
+
+
+class SharedPredictionCache:
+    """
+    Host-wide prediction cache in POSIX shared memory, shared by all workers.
+
+    The table is set-associative open addressing: a key hashes to one bucket
+    of `ways` adjacent slots and is probed there with a single vectorized
+    compare. Each slot is guarded by a seqlock version, so reads take no lock
+    and simply miss when they race a writer. Writers serialize per lock stripe
+    with fcntl byte-range locks (these work across unrelated processes, unlike
+    multiprocessing locks) plus a process-local lock, since fcntl locks do not
+    exclude threads of the same process. A full bucket evicts with the clock algorithm,
+    using the slot reference bits and a per-bucket hand.
+
+    Keys are 64-bit digests of the model key and the quantized feature vector.
+    Values are float64: regression outputs, or crop indices for the crop model.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, n_slots: int, ways: int,
+                 lock_stripes: int, quantum: float, namespace: str = ""):
+        self._shm = shm
+        self.n_slots = n_slots
+        self.ways = ways
+        self.n_buckets = n_slots // ways
+        self.lock_stripes = lock_stripes
+        self.quantum = quantum
+        self.namespace = namespace
+
+        buf = shm.buf
+        offset = 0
+        self._header = np.ndarray((_HEADER_WORDS,), dtype=np.uint64, buffer=buf, offset=offset)
+        offset += self._header.nbytes
+        self._keys = np.ndarray((n_slots,), dtype=np.uint64, buffer=buf, offset=offset)
+        offset += self._keys.nbytes
+        self._values = np.ndarray((n_slots,), dtype=np.float64, buffer=buf, offset=offset)
+        offset += self._values.nbytes
+        self._versions = np.ndarray((n_slots,), dtype=np.uint32, buffer=buf, offset=offset)
+        offset += self._versions.nbytes
+        self._refs = np.ndarray((n_slots,), dtype=np.uint8, buffer=buf, offset=offset)
+        offset += self._refs.nbytes
+        self._hands = np.ndarray((self.n_buckets,), dtype=np.uint8, buffer=buf, offset=offset)
+
+        lock_path = os.path.join(tempfile.gettempdir(), f"{shm.name.lstrip('/')}.lock")
+        self._lock_fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._thread_lock = threading.Lock()
+
+    # ------------------------------------------------------------------ setup
+    @staticmethod
+    def nbytes(n_slots: int, ways: int) -> int:
+        # header + keys + values + versions + refs + clock hands
+        return _HEADER_WORDS * 8 + n_slots * (8 + 8 + 4 + 1) + n_slots // ways
+
+    @classmethod
+    def attach(cls, name: str = SHARED_CACHE_NAME, n_slots: int = SHARED_CACHE_SLOTS,
+               ways: int = SHARED_CACHE_WAYS, lock_stripes: int = SHARED_CACHE_LOCK_STRIPES,
+               quantum: float = SHARED_CACHE_QUANTUM, namespace: str = "",
+               timeout_s: float = 5.0) -> "SharedPredictionCache":
+        """
+        Create the segment, or attach to the one another worker created.
+
+        The creator's shm_open and ftruncate are separate steps, so an
+        attacher can see the segment while it is still empty; it polls until
+        the segment has its full size and the header magic, up to timeout_s.
+        """
+        if n_slots % ways:
+            raise ValueError("n_slots must be a multiple of ways")
+        size = cls.nbytes(n_slots, ways)
+        deadline = time.monotonic() + timeout_s
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            created = True
+        except FileExistsError:
+            created = False
+            while True:
+                try:
+                    shm = shared_memory.SharedMemory(name=name)
+                    if shm.size >= size:
+                        break
+                    shm.close()
+                except ValueError:
+                    pass  # "cannot mmap an empty file": created but not yet sized
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Shared cache {name} never reached {size} bytes")
+                time.sleep(0.01)
+        # The segment outlives any single worker; keep the resource tracker
+        # from unlinking it when this process exits.
+        resource_tracker.unregister(shm._name, "shared_memory")
+
+        cache = cls(shm, n_slots, ways, lock_stripes, quantum, namespace)
+        if created:
+            cache._header[1:] = (_LAYOUT_VERSION, n_slots, ways)
+            cache._header[0] = _MAGIC  # published last: attachers wait for it
+        else:
+            while cache._header[0] != _MAGIC:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Shared cache {name} was never initialized")
+                time.sleep(0.01)
+            layout = tuple(int(v) for v in cache._header[1:])
+            if layout != (_LAYOUT_VERSION, n_slots, ways):
+                raise ValueError(f"Shared cache {name} has layout {layout}, expected {(_LAYOUT_VERSION, n_slots, ways)}")
+        return cache
+
+    def close(self) -> None:
+        os.close(self._lock_fd)
+        self._shm.close()
+
+    @staticmethod
+    def unlink(name: str = SHARED_CACHE_NAME) -> None:
+        """Remove the host-wide segment (e.g. after a model rollout)."""
+        shm = shared_memory.SharedMemory(name=name)
+        shm.close()
+        shm.unlink()
+
+    # ------------------------------------------------------------------ keys
+    def make_key(self, model_key: str, features: np.ndarray) -> np.uint64:
+        quantized = np.round(np.asarray(features, dtype=np.float64) / self.quantum).astype(np.int64)
+        digest = hashlib.blake2b(
+            quantized.tobytes(), digest_size=8, key=f"{self.namespace}:{model_key}".encode()
+        ).digest()
+        return np.uint64(int.from_bytes(digest, "little") | 1)  # 0 marks an empty slot
+
+    def _bucket(self, key: np.uint64) -> int:
+        return (int(key) >> 1) % self.n_buckets
+
+    # ------------------------------------------------------------------ ops
+    def get(self, model_key: str, features: np.ndarray) -> Optional[float]:
+        key = self.make_key(model_key, features)
+        start = self._bucket(key) * self.ways
+        hits = np.flatnonzero(self._keys[start:start + self.ways] == key)
+        if hits.size == 0:
+            return None
+        slot = start + int(hits[0])
+        before = int(self._versions[slot])
+        value = float(self._values[slot])
+        if before & 1 or int(self._versions[slot]) != before or int(self._keys[slot]) != key:
+            return None  # raced a writer; treat as a miss
+        self._refs[slot] = 1
+        return value
+
+    def put(self, model_key: str, features: np.ndarray, value: float) -> None:
+        key = self.make_key(model_key, features)
+        bucket = self._bucket(key)
+        stripe = bucket % self.lock_stripes
+        with self._thread_lock:
+            fcntl.lockf(self._lock_fd, fcntl.LOCK_EX, 1, stripe)
+            try:
+                self._write(bucket, key, value)
+            finally:
+                fcntl.lockf(self._lock_fd, fcntl.LOCK_UN, 1, stripe)
+
+    def _write(self, bucket: int, key: np.uint64, value: float) -> None:
+        """Update key in place, else take a free way, else evict; caller holds the stripe."""
+        start = bucket * self.ways
+        keys = self._keys[start:start + self.ways]
+        match = np.flatnonzero(keys == key)
+        if match.size == 0:
+            match = np.flatnonzero(keys == 0)
+        slot = start + (int(match[0]) if match.size else self._evict(bucket))
+
+        self._versions[slot] += 1  # odd: write in progress
+        self._keys[slot] = key
+        self._values[slot] = value
+        self._refs[slot] = 1
+        self._versions[slot] += 1  # even: stable
+
+    def _evict(self, bucket: int) -> int:
+        """Clock sweep over the bucket; returns the way to overwrite."""
+        start = bucket * self.ways
+        hand = int(self._hands[bucket])
+        while True:
+            slot = start + hand
+            hand = (hand + 1) % self.ways
+            if self._refs[slot]:
+                self._refs[slot] = 0
+            else:
+                self._hands[bucket] = hand
+                return slot - start
+
+    def stats(self) -> dict:
+        return {
+            "slots": self.n_slots,
+            "occupied": int(np.count_nonzero(self._keys)),
+            "bytes": self._shm.size,
+        }
+
+
+_shared_cache = None
+_shared_cache_retry_at = 0.0
+_shared_cache_retry_s = SHARED_CACHE_RETRY_S
+
+
+def artifact_stamp(paths) -> str:
+    """Short digest of the paths' mtimes (0 for a missing file)."""
+    stamps = [f"{path}={path.stat().st_mtime_ns if path.exists() else 0}" for path in paths]
+    return hashlib.blake2b(",".join(stamps).encode(), digest_size=4).hexdigest()
+
+
+def model_namespace() -> str:
+    """
+    Checkpoint and bundle mtimes, so a model rollout does not serve stale
+    entries. Region sets are salted separately when they load (see
+    ModelLoader.load_region_models).
+    """
+    return artifact_stamp([MODEL_BUNDLE_PATH] + [path for _, path in sorted(MODEL_PATHS.items())])
+
+
+def get_shared_cache() -> Optional[SharedPredictionCache]:
+    """
+    Attach to the host-wide cache on first use; None when disabled or
+    unavailable. A failed attach is retried after SHARED_CACHE_RETRY_S,
+    doubling up to SHARED_CACHE_RETRY_MAX_S, rather than given up on.
+    """
+    global _shared_cache, _shared_cache_retry_at, _shared_cache_retry_s
+    if _shared_cache is None and SHARED_CACHE_ENABLED and time.monotonic() >= _shared_cache_retry_at:
+        try:
+            _shared_cache = SharedPredictionCache.attach(namespace=model_namespace())
+            print(f"Attached shared prediction cache {SHARED_CACHE_NAME} ({SHARED_CACHE_SLOTS} slots)")
+        except Exception as e:
+            print(f"Shared prediction cache unavailable, retrying in {_shared_cache_retry_s:.0f} s: {e}")
+            _shared_cache_retry_at = time.monotonic() + _shared_cache_retry_s
+            _shared_cache_retry_s = min(_shared_cache_retry_s * 2, SHARED_CACHE_RETRY_MAX_S)
+    return _shared_cache
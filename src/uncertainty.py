@@ -0,0 +1,145 @@
+# src/uncertainty.py
+import copy
+import threading
+import time
+import weakref
+from typing import Dict
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from config import (
+    CROP_EMBEDDINGS,
+    MC_DROPOUT_MIN_SAMPLES,
+    MC_DROPOUT_MAX_SAMPLES,
+    MC_DROPOUT_LATENCY_BUDGET_MS,
+    MC_DROPOUT_QUANTILES,
+)
+
+CROP_NAMES = list(CROP_EMBEDDINGS)
+_CROP_REFERENCE = np.stack([CROP_EMBEDDINGS[name] for name in CROP_NAMES]).astype(np.float32)
+
+# Serving models stay in eval mode; MC passes run on a dropout-enabled copy
+_stochastic_twins: "weakref.WeakKeyDictionary[nn.Module, nn.Module]" = weakref.WeakKeyDictionary()
+_twins_lock = threading.Lock()
+
+
+def _stochastic_twin(model: nn.Module) -> nn.Module:
+    with _twins_lock:
+        twin = _stochastic_twins.get(model)
+        if twin is None:
+            twin = copy.deepcopy(model)
+            twin.eval()
+            for module in twin.modules():
+                if isinstance(module, nn.Dropout):
+                    module.train()
+            twin.requires_grad_(False)
+            _stochastic_twins[model] = twin
+        return twin
+
+
+class SampleBudget:
+    """
+    Chooses T from an EWMA of the observed cost per (B·T) row.
+
+    Under load every row costs more wall time, so the same latency budget buys
+    fewer samples; when the host is idle T grows back towards the maximum.
+    """
+
+    def __init__(self, budget_ms: float, min_samples: int, max_samples: int, alpha: float = 0.2):
+        self.budget_s = budget_ms / 1e3
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self.alpha = alpha
+        self._cost_per_row_s = None
+        self._lock = threading.Lock()
+
+    def samples_for(self, batch_size: int) -> int:
+        with self._lock:
+            cost = self._cost_per_row_s
+        if cost is None:
+            return self.min_samples
+        samples = int(self.budget_s / (cost * batch_size))
+        return max(self.min_samples, min(self.max_samples, samples))
+
+    def observe(self, rows: int, elapsed_s: float) -> None:
+        cost = elapsed_s / max(rows, 1)
+        with self._lock:
+            if self._cost_per_row_s is None:
+                self._cost_per_row_s = cost
+            else:
+                self._cost_per_row_s += self.alpha * (cost - self._cost_per_row_s)
+
+
+# One budget per model: cost per row differs between the architectures
+sample_budgets = {
+    model_key: SampleBudget(
+        budget_ms=MC_DROPOUT_LATENCY_BUDGET_MS,
+        min_samples=MC_DROPOUT_MIN_SAMPLES,
+        max_samples=MC_DROPOUT_MAX_SAMPLES,
+    )
+    for model_key in ("crop", "sustainability", "yield")
+}
+
+
+def mc_dropout_samples(model: nn.Module, x: torch.Tensor, samples: int) -> torch.Tensor:
+    """Run `samples` stochastic passes over x (B, F) as one batch; returns (B, T, out)."""
+    twin = _stochastic_twin(model)
+    batch_size = x.shape[0]
+    with torch.no_grad():
+        expanded = x.repeat_interleave(samples, dim=0)  # (B·T, F)
+        outputs = twin(expanded)
+    return outputs.reshape(batch_size, samples, -1)
+
+
+def estimate_uncertainty(model_key: str, model: nn.Module, features: np.ndarray,
+                         samples: int | None = None, crop_embeddings: Dict | None = None) -> list:
+    """
+    MC-dropout summary per row of features (B, F) or (F,).
+
+    Regression models get mean / std / quantiles; the crop model gets the
+    share of passes whose embedding lands nearest each reference crop.
+    """
+    features = np.atleast_2d(np.asarray(features, dtype=np.float32))
+    batch_size = features.shape[0]
+    budget = sample_budgets[model_key]
+    samples = samples or budget.samples_for(batch_size)
+
+    device = next(model.parameters()).device
+    x = torch.from_numpy(features).to(device)
+    start = time.perf_counter()
+    outputs = mc_dropout_samples(model, x, samples).cpu().numpy()
+    budget.observe(batch_size * samples, time.perf_counter() - start)
+
+    if model_key == "crop":
+        names, reference = CROP_NAMES, _CROP_REFERENCE
+        if crop_embeddings is not None:
+            names = list(crop_embeddings)
+            reference = np.stack([crop_embeddings[name] for name in names]).astype(np.float32)
+        return [_crop_votes(outputs[i], samples, names, reference) for i in range(batch_size)]
+    return [_regression_summary(outputs[i, :, 0], samples) for i in range(batch_size)]
+
+
+def _regression_summary(values: np.ndarray, samples: int) -> Dict:
+    quantiles = np.quantile(values, MC_DROPOUT_QUANTILES)
+    return {
+        "samples": samples,
+        "mean": round(float(values.mean()), 4),
+        "std": round(float(values.std(ddof=1)), 4),
+        "quantiles": {f"q{int(q * 100):02d}": round(float(v), 4) for q, v in zip(MC_DROPOUT_QUANTILES, quantiles)},
+    }
+
+
+def _crop_votes(embeddings: np.ndarray, samples: int, names: list, reference: np.ndarray) -> Dict:
+    # (T, 64) vs (C, 64) squared distances → nearest crop per pass
+    dists = (
+        (embeddings ** 2).sum(axis=1, keepdims=True)
+        - 2.0 * embeddings @ reference.T
+        + (reference ** 2).sum(axis=1)
+    )
+    counts = np.bincount(dists.argmin(axis=1), minlength=len(names))
+    return {
+        "samples": samples,
+        "votes": {name: round(float(c) / samples, 4) for name, c in zip(names, counts) if c},
+    }
@@ -1,7 +1,8 @@
+import importlib
 import json
 import numpy as np
-import torch
 from datetime import datetime
+from functools import lru_cache
 from typing import Dict, Any
 
 def load_json(path: str) -> Dict[str, Any]:
@@ -14,15 +15,18 @@ def save_json(data: Dict[str, Any], path: str) -> None:
     with open(path, 'w') as f:
         json.dump(data, f, indent=2)
 
-def to_tensor(data: np.ndarray, device: str = None) -> torch.Tensor:
+def to_tensor(data: np.ndarray, device: str = None) -> "torch.Tensor":
     """Convert numpy array to torch tensor"""
+    import torch
     tensor = torch.from_numpy(data).float()
     if device:
         tensor = tensor.to(device)
     return tensor
 
+@lru_cache(maxsize=None)
 def get_device() -> str:
-    """Get the best available device (GPU if available, else CPU)"""
+    """Get the best available device (GPU if available, else CPU); probed once per process"""
+    import torch
     if torch.cuda.is_available():
         return "cuda"
     elif torch.backends.mps.is_available():  # For Apple Silicon Macs
@@ -49,4 +53,30 @@ def validate_input(data: dict, required_fields: list) -> bool:
 def log_prediction(endpoint: str, input_data: dict, prediction: Any) -> None:
     """Log prediction details (in real app, would write to database)"""
     timestamp = datetime.now().isoformat()
-    print(f"[{timestamp}] {endpoint} prediction - Input: {input_data}, Result: {prediction}")
\ No newline at end of file
+    print(f"[{timestamp}] {endpoint} prediction - Input: {input_data}, Result: {prediction}")
+
+class LazyImport:
+    """
+    Stand-in for `from module import name` that imports module on first use
+    (attribute access or call), so torch-backed modules stay out of the
+    import path of app.py until a request or the model warm-up needs them.
+    """
+    def __init__(self, module: str, name: str):
+        self._module = module
+        self._name = name
+        self._target = None
+
+    def resolve(self) -> Any:
+        if self._target is None:
+            self._target = getattr(importlib.import_module(self._module), self._name)
+        return self._target
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.resolve(), attr)
+
+    def __call__(self, *args, **kwargs) -> Any:
+        return self.resolve()(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._target is not None else "not loaded"
+        return f"<lazy {self._module}.{self._name} ({state})>"